@@ -3,7 +3,8 @@ from hmac import new
 import pickle
 import os
 from google_auth_oauthlib.flow import Flow, InstalledAppFlow
-from googleapiclient.discovery import build
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
@@ -11,12 +12,91 @@ from googleapiclient.errors import HttpError
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import json
+import threading
+from datetime import datetime, timedelta
+
+# Refresh a little before the token really expires, so a request never goes out with a dying token
+REFRESH_MARGIN = timedelta(minutes=5)
+
+_credentials = {}
+_discovery_docs = {}
+# Services per thread: a service owns its httplib2.Http, which is not thread-safe
+_local = threading.local()
+_lock = threading.RLock()
+
+
+def _needs_refresh(cred):
+    if not cred.valid:
+        return True
+    return cred.expiry is not None and cred.expiry - datetime.utcnow() < REFRESH_MARGIN
+
+
+def _save_credentials(cred):
+    conn = st.connection("gsheets", type=GSheetsConnection)
+    new_credentials_dict = json.loads(cred.to_json())
+    df = [{'key': key, 'value': value} for key, value in new_credentials_dict.items()]
+    conn.update(worksheet="Authtoken", data=df)
+
+
+def get_credentials(client_secret_file, scopes):
+    """
+    Process-wide credentials per scope set. The Authtoken worksheet is read once, later
+    calls only refresh the token when it is about to expire.
+    """
+    key = tuple(scopes)
+    with _lock:
+        cred = _credentials.get(key)
+        if cred is None:
+            cred = _load_credentials(client_secret_file, list(scopes))
+        elif _needs_refresh(cred) and cred.refresh_token:
+            cred.refresh(Request())
+            print("token refreshed")
+            _save_credentials(cred)
+        _credentials[key] = cred
+        return cred
+
+
+def _discovery_doc(api_name, api_version):
+    """Discovery document bundled with googleapiclient, read from disk once per process."""
+    key = (api_name, api_version)
+    with _lock:
+        doc = _discovery_docs.get(key)
+        if doc is None:
+            doc = _discovery_docs[key] = get_static_doc(api_name, api_version)
+        return doc
+
 
 def Create_Service(client_secret_file, api_name, api_version, *scopes):
-    CLIENT_SECRET_FILE = client_secret_file
-    API_SERVICE_NAME = api_name
-    API_VERSION = api_version
+    """
+    Service object per api, version and scopes, cached for the calling thread only:
+    every service has its own transport, and jobs of several sessions run at once.
+    The credentials and the discovery document are shared by all of them, so
+    building a service makes no request.
+    """
     SCOPES = [scope for scope in scopes[0]]
+    key = (api_name, api_version, tuple(SCOPES))
+    cred = get_credentials(client_secret_file, SCOPES)
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(key)
+    # Refreshes happen in place on the shared credentials, so the service stays valid
+    if service is not None:
+        return service
+    try:
+        service = build_from_document(_discovery_doc(api_name, api_version), credentials=cred)
+        print(api_name, 'Cred valid. Service created successfully')
+    except Exception as e:
+        print('Unable to connect.')
+        print(e)
+        return None
+    services[key] = service
+    return service
+
+
+def _load_credentials(client_secret_file, scopes):
+    CLIENT_SECRET_FILE = client_secret_file
+    SCOPES = scopes
 
     conn = st.connection("gsheets", type=GSheetsConnection)
 
@@ -63,17 +143,12 @@ def Create_Service(client_secret_file, api_name, api_version, *scopes):
         st.write("cred valid")
 
 
-    if not cred or not cred.valid:
+    if not cred or _needs_refresh(cred):
         st.write("cred not valid")
-        if cred and cred.expired and cred.refresh_token:
+        if cred and cred.refresh_token:
             cred.refresh(Request())
             st.write("token refreshed")
-            new_credentials = cred.to_json()
-            new_credentials_dict = json.loads(new_credentials)
-            df = [{'key': key, 'value': value} for key, value in new_credentials_dict.items()]
-            st.write(df)
-            conn.update(worksheet="Authtoken",
-                        data = df)
+            _save_credentials(cred)
         else:
             # CLIENT_SECRET_FILE = conn.read(
             #     worksheet="GoogleDriveAPISecrets",
@@ -89,12 +164,5 @@ def Create_Service(client_secret_file, api_name, api_version, *scopes):
             # pickle.dump(cred, token)
         # with open("token.json", "w") as token:
         #     token.write(cred.to_json())
-    try:
-        service = build(API_SERVICE_NAME, API_VERSION, credentials=cred)
-        print(API_SERVICE_NAME, 'Cred valid. Service created successfully')
-        return service
-    except Exception as e:
-        print('Unable to connect.')
-        print(e)
-        return None
+    return cred
 
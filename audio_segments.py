@@ -0,0 +1,115 @@
+import glob
+import os
+import re
+import subprocess
+
+# Upload limit of the Whisper API
+UPLOAD_LIMIT_BYTES = 25 * 1024 * 1024
+# Mono 16 kHz speech, which is what Whisper resamples to anyway; 32 kbps keeps it
+# intelligible and fits well over an hour in one upload
+SAMPLE_RATE = 16000
+BITRATE = 32000
+SILENCE_NOISE = "-30dB"
+SILENCE_MIN_DURATION = 0.5
+# How far a split point may move from its regular position to land in a silence
+SILENCE_WINDOW = 30.0
+
+DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+SILENCE_PATTERN = re.compile(r"silence_(start|end): (-?[\d.]+)")
+
+
+def run_ffmpeg(command):
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr[-2000:]}")
+    return result.stderr
+
+
+def encode_options(bitrate=BITRATE):
+    return ["-vn", "-ac", "1", "-ar", str(SAMPLE_RATE), "-c:a", "libmp3lame", "-b:a", f"{bitrate // 1000}k"]
+
+
+def max_segment_seconds(bitrate=BITRATE, limit=UPLOAD_LIMIT_BYTES):
+    # 5% headroom for the container and the frame padding
+    return limit * 8 * 0.95 / bitrate
+
+
+def parse_silences(stderr):
+    """Media duration and the (start, end) silences from the log of a silencedetect run."""
+    match = DURATION_PATTERN.search(stderr)
+    duration = int(match.group(1)) * 3600 + int(match.group(2)) * 60 + float(match.group(3)) if match else 0.0
+    silences = []
+    start = None
+    for kind, value in SILENCE_PATTERN.findall(stderr):
+        if kind == "start":
+            start = max(0.0, float(value))
+        elif start is not None:
+            silences.append((start, float(value)))
+            start = None
+    if start is not None:
+        silences.append((start, duration))
+    return duration, silences
+
+
+def split_points(duration, segment_seconds, silences, window=SILENCE_WINDOW):
+    """
+    Split times every `segment_seconds`, each moved to the middle of the closest
+    silence within `window` seconds, so no chunk starts or ends mid-word.
+    """
+    middles = [(start + end) / 2 for start, end in silences]
+    points = []
+    target = segment_seconds
+    while target < duration:
+        last = points[-1] if points else 0.0
+        candidates = [middle for middle in middles if abs(middle - target) <= window and middle > last]
+        point = min(candidates, key=lambda middle: abs(middle - target)) if candidates else target
+        points.append(point)
+        target = point + segment_seconds
+    return points
+
+
+def segment_audio(video_path, audio_path, chunks_folder, chunk_minutes=10, silence_aware=True, bitrate=BITRATE):
+    """
+    Extract the audio track of `video_path` as low-bitrate mono mp3 and cut it into
+    `chunks_folder`/chunk_000.mp3, chunk_001.mp3, ... each small enough for one
+    upload. ffmpeg streams the whole way, so memory stays flat however long the
+    meeting is, and the audio is encoded once:
+
+    - without silence detection, a single ffmpeg run encodes straight into the
+      segment muxer;
+    - with it, the encode also runs silencedetect, and the segments are then cut
+      from that mp3 by stream copy at the chosen split points.
+
+    Returns the chunk paths in order.
+    """
+    os.makedirs(chunks_folder, exist_ok=True)
+    # Chunks of an earlier upload would otherwise be transcribed with this one
+    for old_chunk in glob.glob(os.path.join(chunks_folder, "chunk_*.mp3")):
+        os.remove(old_chunk)
+    window = SILENCE_WINDOW if silence_aware else 0.0
+    # A split that moves into a silence makes its chunk up to `window` longer
+    segment_seconds = min(chunk_minutes * 60, max_segment_seconds(bitrate) - window)
+    segments = ["-f", "segment", "-reset_timestamps", "1"]
+    chunk_pattern = os.path.join(chunks_folder, "chunk_%03d.mp3")
+    if silence_aware:
+        stderr = run_ffmpeg(
+            ["ffmpeg", "-y", "-hide_banner", "-nostats", "-i", video_path]
+            + encode_options(bitrate)
+            + ["-af", f"silencedetect=noise={SILENCE_NOISE}:d={SILENCE_MIN_DURATION}", audio_path]
+        )
+        duration, silences = parse_silences(stderr)
+        points = split_points(duration, segment_seconds, silences, window)
+        if points:
+            times = ["-segment_times", ",".join(f"{point:.3f}" for point in points)]
+        else:
+            # Shorter than one segment; without any time the muxer cuts every 2 seconds
+            times = ["-segment_time", f"{segment_seconds:.3f}"]
+        run_ffmpeg(["ffmpeg", "-y", "-hide_banner", "-i", audio_path, "-c", "copy"] + segments + times + [chunk_pattern])
+    else:
+        run_ffmpeg(
+            ["ffmpeg", "-y", "-hide_banner", "-i", video_path]
+            + encode_options(bitrate)
+            + segments
+            + ["-segment_time", f"{segment_seconds:.3f}", chunk_pattern]
+        )
+    return sorted(glob.glob(os.path.join(chunks_folder, "chunk_*.mp3")))
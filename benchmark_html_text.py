@@ -0,0 +1,99 @@
+"""
+Compare the html-to-text backends of html_text.py on saved pages.
+
+    python benchmark_html_text.py --save https://www.moyoplan.com/plans/15000 --out .cache/pages/moyo
+    python benchmark_html_text.py .cache/pages/sitemap
+    python benchmark_html_text.py --moyo .cache/pages/moyo
+"""
+import argparse
+import os
+import time
+
+import requests
+
+from html_text import BACKENDS, WHITESPACE, bs4_text
+from moyo_extract import regex_extract
+from moyo_parse import parse_plan_html
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(
+                os.path.join(path, name) for name in os.listdir(path) if name.endswith((".html", ".htm"))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def save_pages(urls, out):
+    os.makedirs(out, exist_ok=True)
+    for url in urls:
+        response = requests.get(url, timeout=30)
+        name = url.rstrip("/").split("/")[-1] or "index"
+        with open(os.path.join(out, f"{name}.html"), "wb") as f:
+            f.write(response.content)
+        print(f"Saved {url} ({len(response.content)} bytes)")
+
+
+def timed(function, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        results = [function(page) for page in pages]
+    return (time.perf_counter() - started) / repeat, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", help="Saved .html files or directories of them")
+    parser.add_argument("--moyo", action="store_true", help="Also compare the extracted Moyo rows")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", nargs="+", metavar="URL", help="Download pages first")
+    parser.add_argument("--out", default="./.cache/pages")
+    args = parser.parse_args()
+
+    if args.save:
+        save_pages(args.save, args.out)
+    files = collect(args.paths)
+    if not files:
+        parser.error("no saved pages to benchmark")
+    pages = []
+    for path in files:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / 1024 ** 2:.1f} MB, mean of {args.repeat} runs")
+
+    texts = {}
+    for name, backend in BACKENDS.items():
+        seconds, texts[name] = timed(backend, pages, args.repeat)
+        print(f"{name:>6}: {seconds * 1000:8.1f} ms  {len(pages) / seconds:8.1f} pages/s")
+    baseline = texts["bs4"]
+    for name, results in texts.items():
+        if name == "bs4":
+            continue
+        same = sum(
+            WHITESPACE.sub(" ", a).strip() == WHITESPACE.sub(" ", b).strip()
+            for a, b in zip(baseline, results)
+        )
+        print(f"{name:>6}: {same}/{len(pages)} pages with the same text as bs4 (whitespace normalized)")
+
+    if args.moyo:
+        # The page text is not normalized for the regexes, compare what ends up in the sheet
+        seconds, old_rows = timed(
+            lambda page: regex_extract(bs4_text(page, strip=(), normalize=False)), pages, args.repeat
+        )
+        print(f"  moyo bs4: {seconds * 1000:8.1f} ms")
+        seconds, new_rows = timed(lambda page: parse_plan_html(page)["row"], pages, args.repeat)
+        print(f" moyo lxml: {seconds * 1000:8.1f} ms")
+        for path, old, new in zip(files, old_rows, new_rows):
+            if old != new:
+                print(f"Row differs for {path}:")
+                print(f"   bs4: {old}\n  lxml: {new}")
+        same = sum(old == new for old, new in zip(old_rows, new_rows))
+        print(f"{same}/{len(pages)} Moyo rows identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+JOURNAL_PATH = "./.cache/crawls/journal.sqlite"
+
+PENDING = "pending"
+FETCHED = "fetched"
+WRITTEN = "written"
+FAILED = "failed"
+# Failed in MAX_ATTEMPTS runs; given up on, so the crawl can still finish
+ABANDONED = "abandoned"
+DONE_STATES = (WRITTEN, ABANDONED)
+MAX_ATTEMPTS = 3
+# A running crawl renews its lease every HEARTBEAT_INTERVAL seconds; one whose
+# heartbeat is older than LEASE_SECONDS has no live job and may be resumed
+HEARTBEAT_INTERVAL = 30.0
+LEASE_SECONDS = 120.0
+
+CRAWL_COLUMNS = "crawl_id, kind, sheet_id, sheet_url, params, created, done"
+
+
+class CrawlJournal:
+    """
+    Checkpoints of the Moyo crawls: the target sheet of every crawl and the state
+    of each of its urls (pending, fetched, written to the local plan store, failed
+    or abandoned), so an interrupted crawl can be resumed with only the urls that
+    were never stored. A url that fails in `max_attempts` runs is abandoned.
+    The job running a crawl holds a lease on it (`lease`), so it is not offered
+    for resuming while it still runs.
+    """
+
+    def __init__(self, path=JOURNAL_PATH, max_attempts=MAX_ATTEMPTS):
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS crawls ("
+                "crawl_id TEXT PRIMARY KEY, kind TEXT, sheet_id TEXT, sheet_url TEXT, "
+                "params TEXT, created REAL, done INTEGER DEFAULT 0, heartbeat REAL)"
+            )
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(crawls)")]
+            if "heartbeat" not in columns:
+                self.conn.execute("ALTER TABLE crawls ADD COLUMN heartbeat REAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS urls ("
+                "crawl_id TEXT, url TEXT, state TEXT, updated REAL, error TEXT, attempts INTEGER DEFAULT 0, "
+                "PRIMARY KEY (crawl_id, url))"
+            )
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(urls)")]
+            if "attempts" not in columns:
+                self.conn.execute("ALTER TABLE urls ADD COLUMN attempts INTEGER DEFAULT 0")
+
+    def start_crawl(self, kind, sheet_id, sheet_url, params=None):
+        crawl_id = uuid.uuid4().hex
+        now = time.time()
+        # Leased from the start, the job that started it is running it
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO crawls (crawl_id, kind, sheet_id, sheet_url, params, created, heartbeat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (crawl_id, kind, sheet_id, sheet_url, json.dumps(params or {}), now, now),
+            )
+        return crawl_id
+
+    def crawl(self, crawl_id):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {CRAWL_COLUMNS} FROM crawls WHERE crawl_id = ?", (crawl_id,)
+            ).fetchone()
+        return self._crawl(row) if row else None
+
+    def latest_unfinished(self, exclude=()):
+        """Newest open crawl that no job holds a lease on, leaving out the crawl ids in `exclude`."""
+        exclude = list(exclude)
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {CRAWL_COLUMNS} FROM crawls "
+                f"WHERE done = 0 AND (heartbeat IS NULL OR heartbeat < ?) "
+                f"AND crawl_id NOT IN ({', '.join('?' for _ in exclude)}) ORDER BY created DESC LIMIT 1",
+                [time.time() - LEASE_SECONDS, *exclude],
+            ).fetchone()
+        return self._crawl(row) if row else None
+
+    def heartbeat(self, crawl_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE crawls SET heartbeat = ? WHERE crawl_id = ?", (time.time(), crawl_id))
+
+    def release(self, crawl_id):
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE crawls SET heartbeat = NULL WHERE crawl_id = ?", (crawl_id,))
+
+    @contextmanager
+    def lease(self, crawl_id, interval=HEARTBEAT_INTERVAL):
+        """Hold the lease on a crawl for the duration of the block, renewing it on a background thread."""
+        stopped = threading.Event()
+
+        def renew():
+            while not stopped.wait(interval):
+                self.heartbeat(crawl_id)
+
+        self.heartbeat(crawl_id)
+        thread = threading.Thread(target=renew, daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stopped.set()
+            thread.join()
+            self.release(crawl_id)
+
+    def _crawl(self, row):
+        crawl_id, kind, sheet_id, sheet_url, params, created, done = row
+        return {
+            "crawl_id": crawl_id,
+            "kind": kind,
+            "sheet_id": sheet_id,
+            "sheet_url": sheet_url,
+            "params": json.loads(params),
+            "created": created,
+            "done": bool(done),
+        }
+
+    def add_urls(self, crawl_id, urls):
+        """Record urls as pending; returns the ones that were not in the journal yet."""
+        added = []
+        now = time.time()
+        with self.lock, self.conn:
+            for url in urls:
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO urls (crawl_id, url, state, updated) VALUES (?, ?, ?, ?)",
+                    (crawl_id, url, PENDING, now),
+                )
+                if cursor.rowcount:
+                    added.append(url)
+        return added
+
+    def mark(self, crawl_id, urls, state, error=None):
+        now = time.time()
+        if state == FAILED:
+            self.fail(crawl_id, urls, error, now)
+            return
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE urls SET state = ?, updated = ?, error = ? WHERE crawl_id = ? AND url = ?",
+                [(state, now, error, crawl_id, url) for url in urls],
+            )
+
+    def fail(self, crawl_id, urls, error, now):
+        """Count a failed attempt; the last allowed one abandons the url."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE urls SET state = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END, "
+                "attempts = attempts + 1, updated = ?, error = ? WHERE crawl_id = ? AND url = ?",
+                [(self.max_attempts, ABANDONED, FAILED, now, error, crawl_id, url) for url in urls],
+            )
+
+    def unfinished(self, crawl_id):
+        """Every url that is not stored or abandoned yet. Fetched rows lived only in memory, so they count too."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url FROM urls WHERE crawl_id = ? AND state NOT IN (?, ?) ORDER BY rowid",
+                (crawl_id, *DONE_STATES),
+            ).fetchall()
+        return [url for url, in rows]
+
+    def counts(self, crawl_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT state, COUNT(*) FROM urls WHERE crawl_id = ? GROUP BY state", (crawl_id,)
+            ).fetchall()
+        return dict(rows)
+
+    def finish(self, crawl_id):
+        """Close the crawl once every url is written or abandoned; returns whether it was closed."""
+        counts = self.counts(crawl_id)
+        if any(state not in DONE_STATES for state in counts):
+            return False
+        with self.lock, self.conn:
+            self.conn.execute("UPDATE crawls SET done = 1 WHERE crawl_id = ?", (crawl_id,))
+        return True
@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import deque
+
+import psutil
+
+
+def _tree_rss(process):
+    """RSS of the process and its children, so the Chromium instances are counted too."""
+    rss = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            rss += child.memory_info().rss
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    return rss
+
+
+class MetricsSampler:
+    """
+    Samples CPU, memory, queue depths and per-stage throughput on a background
+    thread into a ring buffer of the last `size` samples. Stages report progress
+    with `count`, and the page reads the buffer with `samples` / `latest`.
+    """
+
+    def __init__(self, interval=1.0, size=600):
+        self.interval = interval
+        self.buffer = deque(maxlen=size)
+        self.queues = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.process = psutil.Process()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def watch_queue(self, name, queue):
+        with self.lock:
+            self.queues[name] = queue
+
+    def count(self, stage, n=1):
+        with self.lock:
+            self.counters[stage] = self.counters.get(stage, 0) + n
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return self
+        self.stopped.clear()
+        # The first cpu_percent call only primes the counters
+        psutil.cpu_percent()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread:
+            self.thread.join()
+        self.sample()
+
+    def _run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        now = time.monotonic()
+        with self.lock:
+            counters = dict(self.counters)
+            depths = {name: queue.qsize() for name, queue in self.queues.items()}
+        previous = self.buffer[-1] if self.buffer else None
+        sample = {
+            "time": time.time(),
+            "cpu_percent": psutil.cpu_percent(),
+            "memory_percent": memory.percent,
+            "rss_mb": _tree_rss(self.process) / (1024 ** 2),
+            "swap_mb": swap.used / (1024 ** 2),
+            "_monotonic": now,
+            "_counters": counters,
+        }
+        for name, depth in depths.items():
+            sample[f"{name}_depth"] = depth
+        for stage, total in counters.items():
+            sample[f"{stage}_total"] = total
+            if previous:
+                elapsed = max(now - previous["_monotonic"], 1e-6)
+                done = total - previous["_counters"].get(stage, 0)
+                sample[f"{stage}_per_second"] = done / elapsed
+            else:
+                sample[f"{stage}_per_second"] = 0.0
+        self.buffer.append(sample)
+        return sample
+
+    def samples(self):
+        """Copy of the ring buffer without the bookkeeping fields."""
+        return [
+            {key: value for key, value in sample.items() if not key.startswith("_")}
+            for sample in list(self.buffer)
+        ]
+
+    def latest(self):
+        samples = self.samples()
+        return samples[-1] if samples else None
@@ -0,0 +1,88 @@
+import os
+import re
+
+from bs4 import BeautifulSoup
+from lxml import etree, html as lxml_html
+
+# Element contents that BeautifulSoup's get_text() leaves out as well
+NON_TEXT_TAGS = {"script", "style", "template"}
+WHITESPACE = re.compile(r"\s+")
+UTF8_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+
+def bs4_text(markup, strip=("header", "footer"), normalize=True):
+    """The original path: html.parser, get_text() and string replaces."""
+    soup = BeautifulSoup(markup, "html.parser")
+    for tag in strip:
+        element = soup.find(tag)
+        if element:
+            element.decompose()
+    text = soup.get_text()
+    if normalize:
+        text = text.replace("\n", " ").replace("\xa0", " ")
+    return text
+
+
+def parse_document(markup):
+    if isinstance(markup, bytes):
+        # Without a <meta charset> lxml reads bytes as Latin-1 and Korean text turns
+        # into mojibake. bs4 sniffs the encoding; do the same for the common case
+        # and leave other encodings to lxml's <meta> detection.
+        try:
+            markup = markup.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+    if isinstance(markup, str) and markup.lstrip().startswith("<?xml"):
+        # lxml refuses str input that carries an encoding declaration
+        root = lxml_html.fromstring(markup.encode("utf-8"), parser=UTF8_PARSER)
+    else:
+        root = lxml_html.fromstring(markup)
+    # fromstring hands back the first element of a fragment, walk the whole document
+    return root.getroottree().getroot()
+
+
+def tree_text(root, strip=("header", "footer"), normalize=True):
+    """
+    Text of an lxml tree in a single walk that skips the stripped and non-text
+    elements. With `normalize`, runs of whitespace (newlines and nbsp included)
+    become one space.
+    """
+    skip = NON_TEXT_TAGS.union(strip)
+    parts = []
+
+    def walk(element):
+        if isinstance(element.tag, str) and element.tag not in skip:
+            if element.text:
+                parts.append(element.text)
+            for child in element:
+                walk(child)
+        if element.tail and element is not root:
+            parts.append(element.tail)
+
+    walk(root)
+    text = "".join(parts)
+    if normalize:
+        text = WHITESPACE.sub(" ", text)
+    return text
+
+
+def lxml_text(markup, strip=("header", "footer"), normalize=True):
+    """Fast path: the lxml parser and tree_text."""
+    if not markup or not markup.strip():
+        return ""
+    return tree_text(parse_document(markup), strip, normalize)
+
+
+BACKENDS = {
+    "bs4": bs4_text,
+    "lxml": lxml_text,
+}
+DEFAULT_BACKEND = os.environ.get("HTML_TEXT_BACKEND", "lxml")
+
+
+def html_to_text(markup, backend=DEFAULT_BACKEND, strip=("header", "footer"), normalize=True):
+    """Visible text of an html document with the given backend (see BACKENDS)."""
+    try:
+        return BACKENDS[backend](markup, strip=strip, normalize=normalize)
+    except etree.ParserError:
+        return ""
@@ -0,0 +1,91 @@
+import hashlib
+import os
+import pickle
+import shutil
+
+import faiss
+
+from langchain.embeddings import CacheBackedEmbeddings
+from langchain.storage import LocalFileStore
+from langchain.vectorstores.faiss import FAISS
+
+CACHE_DIR = "./.cache"
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def save_upload(file, folder):
+    """Write an uploaded file under its content hash and return (hash, path)."""
+    file_content = file.read()
+    file_hash = content_hash(file_content)
+    extension = os.path.splitext(file.name)[1].lower()
+    file_dir = f"{CACHE_DIR}/{folder}"
+    os.makedirs(file_dir, exist_ok=True)
+    file_path = f"{file_dir}/{file_hash}{extension}"
+    if not os.path.exists(file_path):
+        with open(file_path, "wb") as f:
+            f.write(file_content)
+    return file_hash, file_path
+
+
+def cached_embeddings(embeddings, namespace, key):
+    # CacheBackedEmbeddings keys every vector by the hash of the chunk text,
+    # so with the document hash as directory each entry is (document, chunk).
+    cache_dir = LocalFileStore(f"{CACHE_DIR}/embeddings/{namespace}/{key}")
+    return CacheBackedEmbeddings.from_bytes_store(embeddings, cache_dir)
+
+
+def index_path(namespace, key):
+    return f"{CACHE_DIR}/indexes/{namespace}/{key}"
+
+
+def load_index(index_dir, embeddings):
+    """
+    Load an index written by `save_index`. This skips embedding the document
+    again, but the vectors are still read into memory: the flat index LangChain
+    builds cannot be memory-mapped by the pinned faiss.
+    """
+    index = faiss.read_index(f"{index_dir}/index.faiss")
+    with open(f"{index_dir}/index.pkl", "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+def save_index(vectorstore, index_dir):
+    # Save next to the final path and swap it in, so a crash mid-write never
+    # leaves a half written index behind for the next run to load.
+    tmp_dir = f"{index_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    vectorstore.save_local(tmp_dir)
+    shutil.rmtree(index_dir, ignore_errors=True)
+    os.replace(tmp_dir, index_dir)
+
+
+def has_index(index_dir):
+    return os.path.exists(f"{index_dir}/index.faiss")
+
+
+def load_or_build_index(namespace, key, load_docs, embeddings):
+    """
+    Return the FAISS index stored for `key`, building it from `load_docs()` only
+    when no index has been saved yet. The index survives server restarts and an
+    identical upload never re-embeds.
+    """
+    index_dir = index_path(namespace, key)
+    if has_index(index_dir):
+        return load_index(index_dir, embeddings)
+    docs = load_docs()
+    if not docs:
+        return None
+    ids = [f"{key}-{i}" for i in range(len(docs))]
+    for chunk_id, doc in zip(ids, docs):
+        doc.metadata["chunk_id"] = chunk_id
+    vectorstore = FAISS.from_documents(
+        docs,
+        cached_embeddings(embeddings, namespace, key),
+        ids=ids,
+    )
+    save_index(vectorstore, index_dir)
+    return vectorstore
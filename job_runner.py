@@ -0,0 +1,152 @@
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from crawl_metrics import MetricsSampler
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Finished jobs are kept this long for the pages to show their outcome
+FINISHED_JOB_TTL = 3600.0
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+class Job:
+    """
+    State of one background job. The job function gets the Job as its first argument
+    and reports through it: `error` / `log` for messages, `update` for progress and
+    `metrics` for resource sampling. It should stop early once `cancelled()` is true.
+    """
+
+    def __init__(self, name, max_messages=200):
+        self.job_id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = QUEUED
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.progress = {}
+        self.errors = []
+        self.logs = []
+        self.result = None
+        self.max_messages = max_messages
+        self.metrics = MetricsSampler()
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+
+    def cancelled(self):
+        return self.cancel_event.is_set()
+
+    def error(self, message):
+        with self.lock:
+            self.errors = (self.errors + [str(message)])[-self.max_messages:]
+
+    def log(self, message):
+        with self.lock:
+            self.logs = (self.logs + [str(message)])[-self.max_messages:]
+
+    def update(self, **progress):
+        with self.lock:
+            self.progress.update(progress)
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "job_id": self.job_id,
+                "name": self.name,
+                "status": self.status,
+                "created": self.created,
+                "started": self.started,
+                "finished": self.finished,
+                "progress": dict(self.progress),
+                "errors": list(self.errors),
+                "logs": list(self.logs),
+            }
+
+
+class JobRunner:
+    """Runs jobs on its own worker threads, independent of the Streamlit script runs that start them."""
+
+    def __init__(self, max_workers=4, finished_job_ttl=FINISHED_JOB_TTL):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.jobs = {}
+        self.finished_job_ttl = finished_job_ttl
+        self.lock = threading.Lock()
+
+    def submit(self, name, function, *args, **kwargs):
+        job = Job(name)
+        self.prune()
+        with self.lock:
+            self.jobs[job.job_id] = job
+        self.executor.submit(self._run, job, function, args, kwargs)
+        return job.job_id
+
+    def _run(self, job, function, args, kwargs):
+        if job.cancelled():
+            job.status = CANCELLED
+            job.finished = time.time()
+            return
+        job.status = RUNNING
+        job.started = time.time()
+        job.metrics.start()
+        try:
+            job.result = function(job, *args, **kwargs)
+            job.status = CANCELLED if job.cancelled() else DONE
+        except Exception as e:
+            job.error(f"{e}\n{traceback.format_exc()}")
+            job.status = FAILED
+        finally:
+            job.metrics.stop()
+            job.finished = time.time()
+
+    def prune(self):
+        """Forget jobs that finished more than `finished_job_ttl` seconds ago."""
+        cutoff = time.time() - self.finished_job_ttl
+        with self.lock:
+            for job_id, job in list(self.jobs.items()):
+                if not job.active and job.finished is not None and job.finished < cutoff:
+                    del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def status(self, job_id):
+        job = self.get(job_id)
+        return job.status if job else None
+
+    def progress(self, job_id):
+        job = self.get(job_id)
+        return job.snapshot() if job else None
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            job.cancel_event.set()
+        return job is not None
+
+    def list_jobs(self, name=None):
+        with self.lock:
+            jobs = list(self.jobs.values())
+        return [job.snapshot() for job in jobs if name is None or job.name == name]
+
+
+def get_job_runner(max_workers=4):
+    """Process-wide runner, shared by every Streamlit session."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(max_workers)
+        return _runner
@@ -0,0 +1,164 @@
+import re
+from typing import NamedTuple
+
+NOT_PROVIDED = "제공안함"
+
+
+class PlanRecord(NamedTuple):
+    """One Moyo plan, in the column order of the Google Sheet (after the url)."""
+
+    mvno: str                   # MVNO
+    plan_name: str              # 요금제명
+    monthly_fee: str            # 월 요금
+    monthly_data: str           # 월 데이터
+    daily_data: str             # 일 데이터
+    data_speed: str             # 데이터 속도
+    call_minutes: str           # 통화(분)
+    text_messages: str          # 문자(건)
+    carrier: str                # 통신사
+    network_type: str           # 망종류
+    discount_info: str          # 할인정보
+    contract: str               # 통신사 약정
+    number_transfer_fee: str    # 번호이동 수수료
+    sim_delivery: str           # 일반 유심 배송
+    nfc_sim_delivery: str       # NFC 유심 배송
+    esim: str                   # eSim
+    support: str                # 지원
+    no_support: str             # 미지원
+    gift_event: str             # 이벤트
+    card_discount: str          # 카드 할인
+
+
+# Patterns without a fixed section marker, searched from the start of the text
+mvno_pattern = re.compile(r"\[(.*?)\]")
+plan_name_pattern = re.compile(r"\]\s*(.*?)\s*\|")
+monthly_fee_pattern = re.compile(r"\|\s*([\d,]+원)\s*\|")
+monthly_data_pattern = re.compile(r"월\s*([.\d]+(?:GB|MB))")
+daily_data_pattern = re.compile(r"매일\s*([.\d]+(?:GB|MB))")
+data_speed_pattern = re.compile(r"\(([.\d]+(?:mbps|gbps))\)")
+call_minutes_pattern = re.compile(r"(\d+분|무제한)")
+text_messages_pattern = re.compile(r"(\d+건|무제한)")
+carrier_pattern = re.compile(r"(LG U\+|SKT|KT)")
+network_type_pattern = re.compile(r"(LTE|3G|4G|5G)")
+discount_info_pattern = re.compile(r"(\d+개월\s*이후\s*[\d,]+원)")
+
+# Patterns that can only match after their section marker. The search starts at the
+# first occurrence of the marker, and is skipped entirely when the marker is absent.
+SECTION_PATTERNS = {
+    "contract": ("통신사 약정", re.compile(r"(?<=통신사 약정)(.*?)(?=통화|펼쳐보기)")),
+    "number_transfer_fee": ("번호이동 수수료", re.compile(r"(?<=번호이동 수수료)(.*?)(?=일반 유심 배송)")),
+    "sim_delivery": ("일반 유심 배송", re.compile(r"(?<=일반 유심 배송)(.*?)(?=NFC 유심 배송)")),
+    "nfc_sim_delivery": ("NFC 유심 배송", re.compile(r"(?<=NFC 유심 배송)(.*?)(?=eSIM)")),
+    "esim": ("eSIM", re.compile(r"(?<=eSIM)(.*?)(?=지원(?! 안함| 안 함))")),
+    "support": ("지원", re.compile(r'지원\s*(.*?)\s*미지원', re.DOTALL)),
+    "no_support": ("미지원", re.compile(r'미지원\s*(.*?)\s*(접기|기본)', re.DOTALL)),
+    "card_discount": ("카드 결합 할인", re.compile(r"카드 결합 할인\s*(.*?)할인")),
+}
+
+사은품_pattern = {
+    "사은품 및 이벤트": re.compile(r"사은품 및 이벤트\s*([^\n]+?)(?=대상:)", re.DOTALL),  # Adjusted to ensure full capture up to "대상:"
+    "대상": re.compile(r"대상:\s*([^지급시기]+)", re.DOTALL),  # Ensure capturing stops correctly before "지급시기"
+    "지급시기": re.compile(r"지급시기:\s*([^\n]+?)(?=요금제 개통 절차)", re.DOTALL),  # Ensure capturing stops correctly before "요금제 개통 절차"
+}
+
+# Categories for 지원 and 미지원
+categories_support = ['모바일 핫스팟', '소액 결제', '해외 로밍', '인터넷 결합', '데이터 쉐어링']
+categories_no_support = ['모바일 핫스팟', '소액 결제', '해외 로밍', '인터넷 결합', '데이터 쉐어링']
+
+MARKERS = sorted(set(marker for marker, _ in SECTION_PATTERNS.values()) | {"사은품 및 이벤트"})
+# Zero-width lookahead so markers that overlap (지원 inside 미지원) are all seen
+marker_pattern = re.compile("(?=(" + "|".join(re.escape(marker) for marker in MARKERS) + "))")
+
+
+def find_markers(text):
+    """First index of every section marker, found in one pass over the text."""
+    positions = {}
+    for match in marker_pattern.finditer(text):
+        positions.setdefault(match.group(1), match.start())
+        if len(positions) == len(MARKERS):
+            break
+    return positions
+
+
+def format_extracted_categories(matches, categories):
+    formatted = []
+    for category in categories:
+        for match in matches:
+            if category in match:
+                start_index = match.find(category)
+                end_index = min([match.find(cat, start_index + 1) for cat in categories if cat in match[start_index + 1:]] + [len(match)])
+                additional_text = match[start_index + len(category):end_index].strip()
+                formatted_text = f"{category}: {additional_text}" if additional_text else category
+                formatted.append(formatted_text)
+                break
+    return ', '.join(formatted)
+
+
+def extract_and_format_info(text, patterns):
+    formatted_results = []
+    for key, pattern in patterns.items():
+        match = pattern.search(text)
+        if match and match.group(1).strip():
+            value = match.group(1).strip()
+        else:
+            formatted_results.append(NOT_PROVIDED)
+            break
+        formatted_results.append(f"{key}: {value}")
+    return ', '.join(formatted_results)
+
+
+def _group(match):
+    return match.group(1) if match else NOT_PROVIDED
+
+
+def extract_plan(strSoup):
+    """Extract one PlanRecord from the text of a plan page."""
+    positions = find_markers(strSoup)
+    sections = {}
+    for name, (marker, pattern) in SECTION_PATTERNS.items():
+        sections[name] = pattern.search(strSoup, positions[marker]) if marker in positions else None
+
+    support = sections["support"]
+    no_support = sections["no_support"]
+    formatted_text_support = format_extracted_categories([support.group(1) if support else ""], categories_support)
+    formatted_text_no_support = format_extracted_categories([no_support.group(1) if no_support else ""], categories_no_support)
+
+    if "사은품 및 이벤트" in positions:
+        formatted_사은품_info = extract_and_format_info(strSoup, 사은품_pattern)
+    else:
+        formatted_사은품_info = NOT_PROVIDED
+
+    card_discount = sections["card_discount"]
+
+    return PlanRecord(
+        _group(mvno_pattern.search(strSoup)),
+        _group(plan_name_pattern.search(strSoup)),
+        _group(monthly_fee_pattern.search(strSoup)),
+        _group(monthly_data_pattern.search(strSoup)),
+        _group(daily_data_pattern.search(strSoup)),
+        _group(data_speed_pattern.search(strSoup)),
+        _group(call_minutes_pattern.search(strSoup)),
+        _group(text_messages_pattern.search(strSoup)),
+        _group(carrier_pattern.search(strSoup)),
+        _group(network_type_pattern.search(strSoup)),
+        _group(discount_info_pattern.search(strSoup)),
+        _group(sections["contract"]),
+        _group(sections["number_transfer_fee"]),
+        _group(sections["sim_delivery"]),
+        _group(sections["nfc_sim_delivery"]),
+        _group(sections["esim"]),
+        formatted_text_support if formatted_text_support else NOT_PROVIDED,
+        formatted_text_no_support if formatted_text_no_support else NOT_PROVIDED,
+        formatted_사은품_info,
+        card_discount.group(1) + "할인" if card_discount else NOT_PROVIDED,
+    )
+
+
+def extract_plans(texts):
+    """Batch API: one PlanRecord per page text."""
+    return [extract_plan(text) for text in texts]
+
+
+def regex_extract(strSoup):
+    """The sheet row (without the url) for one plan page, as a mutable list."""
+    return list(extract_plan(strSoup))
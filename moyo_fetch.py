@@ -0,0 +1,180 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from moyo_extract import NOT_PROVIDED
+from moyo_parse import parse, parse_plan_html
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+}
+BASE_URL = "https://www.moyoplan.com"
+PLAN_LIST_URL = f"{BASE_URL}/plans"
+
+# Positions in the regex_extract row: MVNO, 요금제명 and 월 요금 must always be there,
+# 통신사 약정 .. 미지원 are the sections hidden behind the 펼쳐보기 button.
+REQUIRED_FIELDS = (0, 1, 2)
+EXPAND_ONLY_FIELDS = range(11, 18)
+
+_local = threading.local()
+
+
+def get_session():
+    """One keep-alive requests.Session per thread, so fetch threads never share a connection."""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=2)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(HEADERS)
+        _local.session = session
+    return session
+
+
+def response_text(response):
+    """
+    Body of an html response as str. Without a charset in Content-Type, requests
+    falls back to Latin-1 (and lxml does the same with raw bytes), which turns the
+    Korean text into mojibake. Moyo serves UTF-8, so try that before guessing.
+    """
+    if "charset" in response.headers.get("Content-Type", "").lower():
+        return response.text
+    try:
+        return response.content.decode("utf-8")
+    except UnicodeDecodeError:
+        response.encoding = response.apparent_encoding
+        return response.text
+
+
+def fetch_plan_page(url, timeout=10):
+    """
+    Fetch a plan page without a browser. Returns None unless the server answered 200,
+    otherwise the Future of parse_plan_html, which runs in the parse process pool.
+    """
+    response = get_session().get(url, timeout=timeout)
+    if response.status_code != 200:
+        return None
+    return parse(parse_plan_html, response_text(response))
+
+
+def is_complete(regex_formula):
+    """
+    True when the server-rendered text already had everything the browser would add.
+    Every expandable section must be there: a page that has only some of them may be
+    missing the others, and the browser then fills them in.
+    """
+    fields = list(REQUIRED_FIELDS) + list(EXPAND_ONLY_FIELDS)
+    return all(regex_formula[i] != NOT_PROVIDED for i in fields)
+
+
+def fetch_listing_page(page, attempts=5, timeout=10):
+    """Plan urls on one page of the plan list, [] past the last page. Raises after `attempts` failures."""
+    url = f"{PLAN_LIST_URL}?page={page}"
+    for attempt in range(1, attempts + 1):
+        try:
+            response = get_session().get(url, timeout=timeout)
+            if response.status_code == 200:
+                soup = BeautifulSoup(response.text, 'html.parser')
+                return [f"{BASE_URL}{a_tag['href']}" for a_tag in soup.find_all('a', class_='e3509g015')]
+            error = f"Failed to fetch data from {url}. Status code: {response.status_code}"
+        except requests.RequestException as e:
+            error = f"Failed to fetch data from {url}: {e}"
+        if attempt == attempts:
+            raise RuntimeError(f"Max attempts reached for {url}. {error}")
+        time.sleep(attempt)
+
+
+def probe_listing_page(page, known, on_error=None):
+    """Urls of a listing page, remembered in `known`; None when it could not be fetched, i.e. unknown."""
+    if page not in known:
+        try:
+            known[page] = fetch_listing_page(page)
+        except RuntimeError as e:
+            if on_error:
+                on_error(str(e))
+            return None
+    return known[page]
+
+
+def count_listing_pages(known, on_error=None):
+    """
+    Number of the last non-empty plan list page: gallop 1, 2, 4, .. until a page is
+    empty, then binary search between the last non-empty and the first empty one.
+    The pages fetched on the way are left in `known`. A page that keeps failing
+    ends the search at the last non-empty page found so far, so the count may be
+    too low but never too high; the caller pages on sequentially past it.
+    """
+    if not probe_listing_page(1, known, on_error):
+        return 0
+    low, high = 1, 2
+    while True:
+        urls = probe_listing_page(high, known, on_error)
+        if urls is None:
+            return low
+        if not urls:
+            break
+        low, high = high, high * 2
+    while high - low > 1:
+        middle = (low + high) // 2
+        urls = probe_listing_page(middle, known, on_error)
+        if urls is None:
+            return low
+        if urls:
+            low = middle
+        else:
+            high = middle
+    return low
+
+
+def plan_id(url):
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def discover_plan_urls(max_workers=8, on_error=None, should_stop=None, max_failed_pages=3):
+    """
+    Yield every plan url of the plan list once. Listing pages are fetched in parallel
+    after probing the page count, reusing the pages the probe fetched; the pages past
+    the count (added while crawling, or beyond a failed probe) are paged through at
+    the end, skipping pages that fail until `max_failed_pages` fail in a row.
+    """
+    seen = set()
+
+    def new_urls(urls):
+        for url in urls:
+            if plan_id(url) not in seen:
+                seen.add(plan_id(url))
+                yield url
+
+    known = {}
+    pages = count_listing_pages(known, on_error)
+    for page in range(1, pages + 1):
+        if page in known:
+            yield from new_urls(known[page])
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(fetch_listing_page, page): page for page in range(1, pages + 1) if page not in known
+        }
+        for future in as_completed(futures):
+            if should_stop and should_stop():
+                for pending in futures:
+                    pending.cancel()
+                return
+            try:
+                yield from new_urls(future.result())
+            except Exception as e:
+                if on_error:
+                    on_error(str(e))
+    page = pages + 1
+    failed = 0
+    while failed < max_failed_pages and not (should_stop and should_stop()):
+        urls = probe_listing_page(page, known, on_error)
+        if urls is not None and not urls:
+            break
+        failed = failed + 1 if urls is None else 0
+        yield from new_urls(urls or [])
+        page += 1
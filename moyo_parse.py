@@ -0,0 +1,83 @@
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from html_text import html_to_text, parse_document, tree_text
+from moyo_extract import regex_extract
+
+ERROR_PATTERN = re.compile(r"서버에 문제가 생겼어요|존재하지 않는 요금제에요")
+# Message of the alert an ended plan pops; other scripts call alert() too
+EXPIRED_PATTERN = re.compile(r"종료\s*되었습니다")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# The functions below run in the worker processes, so they stay at module level
+# and only take and return picklable values: raw html in, extracted row out.
+
+def _link(root, *classes):
+    for element in root.find_class(classes[0]):
+        if element.tag == "a" and set(classes) <= set(element.get("class", "").split()):
+            return element.get("href")
+    return None
+
+
+def parse_plan_html(html):
+    """
+    Server-rendered plan page: the sheet row (without the url), the event / card
+    discount links, the error banner (if any) and whether the page pops the
+    "plan ended" alert. The document is parsed once with lxml.
+    """
+    root = parse_document(html)
+    text = tree_text(root, strip=(), normalize=False)
+    error = ERROR_PATTERN.search(text)
+    return {
+        "row": regex_extract(text),
+        "사은품_링크": _link(root, "css-1hdj7cf", "e17wbb0s4"),
+        "카드할인_링크": _link(root, "css-pnutty", "ema3yz60"),
+        "error": error.group() if error else "",
+        "expired": any(EXPIRED_PATTERN.search(script.text or "") for script in root.iter("script")),
+    }
+
+
+def parse_rendered_html(html):
+    """page_source of a browser: the sheet row (without the url) and the error banner (if any)."""
+    text = html_to_text(html, strip=(), normalize=False)
+    error = ERROR_PATTERN.search(text)
+    return {"row": regex_extract(text), "error": error.group() if error else ""}
+
+
+def get_parse_pool(max_workers=None):
+    """Process-wide parse pool. Spawned workers, since the fetch threads are already running."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def parse(function, html):
+    """Run one of the parse functions above in the pool; returns its Future, so the caller can keep fetching."""
+    return get_parse_pool().submit(function, html)
+
+
+class PendingRow:
+    """
+    A sheet row whose page is still being parsed. Fetch threads queue it as is, and
+    the store stage calls `result()`, which waits for the parse and builds the row
+    with `build(parsed)`.
+    """
+
+    def __init__(self, url, future, build):
+        self.url = url
+        self.future = future
+        self.build = build
+
+    def result(self):
+        return self.build(self.future.result())
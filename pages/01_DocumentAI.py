@@ -1,14 +1,12 @@
 from langchain.prompts import ChatPromptTemplate
 from langchain.document_loaders import UnstructuredFileLoader
-from langchain.embeddings import CacheBackedEmbeddings, OpenAIEmbeddings
+from langchain.embeddings import OpenAIEmbeddings
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
-from langchain.storage import LocalFileStore
 from langchain.text_splitter import CharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
 from langchain.chat_models import ChatOpenAI
 from langchain.callbacks.base import BaseCallbackHandler
 import streamlit as st
-import os
+from index_cache import load_or_build_index, save_upload
 
 st.set_page_config(
     page_title="DocumentAI",
@@ -41,24 +39,18 @@ llm = ChatOpenAI(
 
 @st.cache_resource(show_spinner="Embedding file...")
 def embed_file(file):
-    # Ensure .cache/files directory exists
-    file_dir = f"./.cache/files"
-    os.makedirs(file_dir, exist_ok=True)
-    file_content = file.read()
-    file_path = f"./.cache/files/{file.name}"
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    cache_dir = LocalFileStore(f"./.cache/embeddings/{file.name}")
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100,
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    embeddings = OpenAIEmbeddings()
-    cached_embeddings = CacheBackedEmbeddings.from_bytes_store(embeddings, cache_dir)
-    vectorstore = FAISS.from_documents(docs, cached_embeddings)
+    file_hash, file_path = save_upload(file, "files")
+
+    def load_docs():
+        splitter = CharacterTextSplitter.from_tiktoken_encoder(
+            separator="\n",
+            chunk_size=600,
+            chunk_overlap=100,
+        )
+        loader = UnstructuredFileLoader(file_path)
+        return loader.load_and_split(text_splitter=splitter)
+
+    vectorstore = load_or_build_index("documents", file_hash, load_docs, OpenAIEmbeddings())
     retriever = vectorstore.as_retriever()
     return retriever
 
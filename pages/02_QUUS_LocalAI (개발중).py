@@ -1,16 +1,14 @@
 from langchain.prompts import ChatPromptTemplate
 from langchain.document_loaders import UnstructuredFileLoader
-from langchain.embeddings import CacheBackedEmbeddings, OllamaEmbeddings, OpenAIEmbeddings
+from langchain.embeddings import OllamaEmbeddings, OpenAIEmbeddings
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
-from langchain.storage import LocalFileStore
 from langchain.text_splitter import CharacterTextSplitter, RecursiveCharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
 from langchain.chat_models import ChatOllama
 from langchain.callbacks.base import BaseCallbackHandler
 import streamlit as st
 from langserve import RemoteRunnable
 from langchain_core.runnables.schema import StreamEvent
-import os
+from index_cache import load_or_build_index, save_upload
 
 st.set_page_config(
     page_title="쿠스AI",
@@ -70,28 +68,21 @@ llm = RemoteRunnable(LANGSERVE_ENDPOINT)
 #     return retriever
 
 
-@st.cache_data(show_spinner="Embedding file...")
+@st.cache_resource(show_spinner="Embedding file...")
 def embed_file(file):
-    file_content = file.read()
-    file_path = f"./.cache/private_files/{file.name}"
-    file_dir = "./.cache/private_files/"
-    os.makedirs(file_dir, exist_ok=True)
-    with open(file_path, "wb") as f:
-        f.write(file_content)
-    cache_dir_path = f"./.cache/private_embeddings/{file.name}"
-    os.makedirs(cache_dir_path, exist_ok=True)
-    cache_dir = LocalFileStore(cache_dir_path)
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=500,
-        chunk_overlap=50,
-        separators=["\n\n", "\n", "(?<=\. )", " ", ""],
-        length_function=len,
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    embeddings = OpenAIEmbeddings()
-    cached_embeddings = CacheBackedEmbeddings.from_bytes_store(embeddings, cache_dir)
-    vectorstore = FAISS.from_documents(docs, cached_embeddings)
+    file_hash, file_path = save_upload(file, "private_files")
+
+    def load_docs():
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=500,
+            chunk_overlap=50,
+            separators=["\n\n", "\n", "(?<=\. )", " ", ""],
+            length_function=len,
+        )
+        loader = UnstructuredFileLoader(file_path)
+        return loader.load_and_split(text_splitter=splitter)
+
+    vectorstore = load_or_build_index("private_documents", file_hash, load_docs, OpenAIEmbeddings())
     retriever = vectorstore.as_retriever()
     return retriever
 
@@ -1,12 +1,22 @@
 import json
-from langchain.document_loaders import UnstructuredFileLoader
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.callbacks import StreamingStdOutCallbackHandler
 import streamlit as st
-from langchain.retrievers import WikipediaRetriever
 from langchain.schema import BaseOutputParser, output_parser
+from langchain.embeddings import OpenAIEmbeddings
+from quiz_builder import (
+    MAP_REDUCE_MIN_CHUNKS,
+    QUIZ_SIZE,
+    fill_quiz,
+    format_docs,
+    make_quiz,
+    make_quiz_chain,
+    split_document,
+    validate_question,
+)
+from quiz_store import QuizStore, quiz_key
+from wiki_cache import WikiCache
 import os
 
 class JsonOutputParser(BaseOutputParser):
@@ -17,6 +27,7 @@ class JsonOutputParser(BaseOutputParser):
 
 output_parser = JsonOutputParser()
 
+
 st.set_page_config(
     page_title="QuizAI",
     page_icon="❓",
@@ -32,10 +43,6 @@ llm = ChatOpenAI(
 )
 
 
-def format_docs(docs):
-    return "\n\n".join(document.page_content for document in docs)
-
-
 questions_prompt = ChatPromptTemplate.from_messages(
     [
         (
@@ -200,6 +207,12 @@ formatting_prompt = ChatPromptTemplate.from_messages(
 
 formatting_chain = formatting_prompt | llm
 
+# Single pass: one structured function call instead of writing and then formatting the questions
+quiz_chain = make_quiz_chain(llm)
+
+# Store key version of the two-call chain above
+LEGACY_PROMPT_VERSION = "legacy-v1"
+
 
 @st.cache_data(show_spinner="Loading file...")
 def split_file(file):
@@ -212,27 +225,62 @@ def split_file(file):
             f.write(file_content)
     except Exception as e:
         st.error(f"Error occurred while writing the file: {e}")
-    splitter = CharacterTextSplitter.from_tiktoken_encoder(
-        separator="\n",
-        chunk_size=600,
-        chunk_overlap=100,
-    )
-    loader = UnstructuredFileLoader(file_path)
-    docs = loader.load_and_split(text_splitter=splitter)
-    return docs
+    return split_document(file_path)
 
 
-@st.cache_data(show_spinner="Making quiz...")
-def run_quiz_chain(_docs, topic):
+def run_quiz_chain(docs, topic):
     chain = {"context": questions_chain} | formatting_chain | output_parser
-    return chain.invoke(_docs)
+    with st.spinner("Making quiz..."):
+        return quiz_store().get_or_make(docs, chain.invoke, topic, LEGACY_PROMPT_VERSION)
+
+
+@st.cache_resource
+def quiz_store():
+    """Quizzes by the content of their chunks, shared by every session and kept across restarts."""
+    return QuizStore()
+
+
+def stream_quiz(docs):
+    """Yield every question of the single-pass quiz as soon as it is complete and valid."""
+    emitted = 0
+    questions = []
+    for partial in quiz_chain.stream(docs):
+        questions = partial.get("questions", []) if isinstance(partial, dict) else []
+        # The last question may still be streaming, the ones before it are complete
+        while emitted < len(questions) - 1:
+            question = validate_question(questions[emitted])
+            emitted += 1
+            if question:
+                yield question
+    while emitted < len(questions):
+        question = validate_question(questions[emitted])
+        emitted += 1
+        if question:
+            yield question
+
+
+def render_question(question, index):
+    st.write(question["question"])
+    value = st.radio(
+        "Select an option.",
+        [answer["answer"] for answer in question["answers"]],
+        index=None,
+        key=f"question_{index}",
+    )
+    if {"answer": value, "correct": True} in question["answers"]:
+        st.success("Correct!")
+    elif value is not None:
+        st.error("Wrong!")
+
+
+@st.cache_resource
+def wiki_cache():
+    return WikiCache()
 
 
-@st.cache_data(show_spinner="Searching Wikipedia...")
 def wiki_search(term):
-    retriever = WikipediaRetriever(top_k_results=5)
-    docs = retriever.get_relevant_documents(term)
-    return docs
+    with st.spinner("Searching Wikipedia..."):
+        return wiki_cache().search(term, top_k=5)
 
 
 with st.sidebar:
@@ -256,6 +304,11 @@ with st.sidebar:
         topic = st.text_input("Search Wikipedia...")
         if topic:
             docs = wiki_search(topic)
+    single_pass = st.checkbox(
+        "Single-pass generation",
+        value=True,
+        help="One structured function call instead of writing and then formatting the questions.",
+    )
 
 
 if not docs:
@@ -269,18 +322,44 @@ if not docs:
     """
     )
 else:
-    response = run_quiz_chain(docs, topic if topic else file.name)
+    quiz_topic = topic if topic else file.name
+    map_reduce = len(docs) > MAP_REDUCE_MIN_CHUNKS
+    if map_reduce or single_pass:
+        key = quiz_key(docs)
+        response = quiz_store().get(key)
+    else:
+        response = run_quiz_chain(docs, quiz_topic)
     with st.form("questions_form"):
-        st.write(response)
-        for question in response["questions"]:
-            st.write(question["question"])
-            value = st.radio(
-                "Select an option.",
-                [answer["answer"] for answer in question["answers"]],
-                index=None,
-            )
-            if {"answer": value, "correct": True} in question["answers"]:
-                st.success("Correct!")
-            elif value is not None:
-                st.error("Wrong!")
+        if response is None and map_reduce:
+            with st.spinner("Making quiz from the whole document..."):
+                # Same builder as precompute_quizzes.py, so both store the same quiz for this key
+                response = make_quiz(docs, llm, OpenAIEmbeddings())
+            if response["questions"]:
+                quiz_store().put(key, response, quiz_topic)
+            else:
+                st.error("The quiz could not be made, please try again.")
+            for index, question in enumerate(response["questions"]):
+                render_question(question, index)
+        elif response is None:
+            # Render the questions while the function call arguments are still streaming in
+            questions = []
+            with st.spinner("Making quiz..."):
+                for question in stream_quiz(docs):
+                    render_question(question, len(questions))
+                    questions.append(question)
+                if questions:
+                    # Ask for replacements of the questions dropped as invalid
+                    for question in fill_quiz(questions, docs, llm)[len(questions):]:
+                        render_question(question, len(questions))
+                        questions.append(question)
+            response = {"questions": questions}
+            if questions:
+                quiz_store().put(key, response, quiz_topic)
+            else:
+                st.error("The quiz could not be made, please try again.")
+        else:
+            for index, question in enumerate(response["questions"]):
+                render_question(question, index)
+        if 0 < len(response["questions"]) < QUIZ_SIZE:
+            st.warning(f"Only {len(response['questions'])} of {QUIZ_SIZE} questions could be made for this quiz.")
         button = st.form_submit_button()
@@ -1,16 +1,17 @@
-from langchain.document_loaders import SitemapLoader
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 import streamlit as st
+from sitemap_crawler import SitemapCrawler, StreamingSitemapIndex, parse_page
 
 llm = ChatOpenAI(
     temperature=0.1,
 )
 
+ANSWERS_MAX_CONCURRENCY = 8
+
 answers_prompt = ChatPromptTemplate.from_template(
     """
     Using ONLY the following context answer the user's question. If you can't just say you don't know, don't make anything up.
@@ -44,23 +45,20 @@ def get_answers(inputs):
     docs = inputs["docs"]
     question = inputs["question"]
     answers_chain = answers_prompt | llm
-    # answers = []
-    # for doc in docs:
-    #     result = answers_chain.invoke(
-    #         {"question": question, "context": doc.page_content}
-    #     )
-    #     answers.append(result.content)
+    # Score every doc in one concurrent batch instead of one LLM call after another
+    results = answers_chain.batch(
+        [{"question": question, "context": doc.page_content} for doc in docs],
+        config={"max_concurrency": ANSWERS_MAX_CONCURRENCY},
+    )
     return {
         "question": question,
         "answers": [
             {
-                "answer": answers_chain.invoke(
-                    {"question": question, "context": doc.page_content}
-                ).content,
+                "answer": result.content,
                 "source": doc.metadata["source"],
                 "date": doc.metadata["lastmod"],
             }
-            for doc in docs
+            for doc, result in zip(docs, results)
         ],
     }
 
@@ -100,35 +98,18 @@ def choose_answer(inputs):
     )
 
 
-def parse_page(soup):
-    header = soup.find("header")
-    footer = soup.find("footer")
-    if header:
-        header.decompose()
-    if footer:
-        footer.decompose()
-    return (
-        str(soup.get_text())
-        .replace("\n", " ")
-        .replace("\xa0", " ")
-        .replace("CloseSearch Submit Blog", "")
-    )
-
-
-@st.cache_data(show_spinner="Loading website...")
-def load_website(url):
+@st.cache_resource(show_spinner="Loading website...")
+def load_website(url, _requests_per_second):
     splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
         chunk_size=1000,
         chunk_overlap=200,
     )
-    loader = SitemapLoader(
-        url,
-        parsing_function=parse_page,
+    crawler = SitemapCrawler(
+        parse_page,
+        requests_per_second=_requests_per_second,
     )
-    loader.requests_per_second = 2
-    docs = loader.load_and_split(text_splitter=splitter)
-    vector_store = FAISS.from_documents(docs, OpenAIEmbeddings())
-    return vector_store.as_retriever()
+    index = StreamingSitemapIndex(url, crawler, splitter, OpenAIEmbeddings())
+    return index.start()
 
 
 st.set_page_config(
@@ -153,6 +134,12 @@ with st.sidebar:
         "Write down a URL",
         placeholder="https://example.com",
     )
+    requests_per_second = st.slider(
+        "Requests per second (per host)",
+        min_value=1,
+        max_value=20,
+        value=2,
+    )
 
 
 if url:
@@ -160,7 +147,22 @@ if url:
         with st.sidebar:
             st.error("Please write down a Sitemap URL.")
     else:
-        retriever = load_website(url)
+        index = load_website(url, requests_per_second)
+        with st.sidebar:
+            if st.button("Refresh index", disabled=not index.done.is_set()):
+                index.crawler.requests_per_second = requests_per_second
+                index.refresh()
+        if not index.ready.is_set():
+            with st.spinner("Indexing the first pages..."):
+                index.ready.wait()
+        if index.error:
+            st.error(f"Failed to crawl the sitemap: {index.error}")
+        elif not index.done.is_set():
+            st.caption(
+                f"Still crawling: {index.indexed} of {index.crawler.total} pages indexed. "
+                "Answers use the pages indexed so far."
+            )
+        retriever = index.as_retriever()
         query = st.text_input("Ask a question to the website.")
         if query:
             chain = (
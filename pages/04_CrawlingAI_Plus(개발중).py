@@ -1,8 +1,6 @@
 # coding:utf-8
-from langchain.document_loaders import SitemapLoader
 from langchain.schema.runnable import RunnableLambda, RunnablePassthrough
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.vectorstores.faiss import FAISS
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
@@ -13,13 +11,8 @@ from langchain.schema import Document
 # import platform
 # import os, sys
 import streamlit as st
-from selenium import webdriver
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome import service as fs
-from selenium.webdriver import ChromeOptions
-# from webdriver_manager.core.utils import ChromeType
-from webdriver_manager.core.os_manager import ChromeType
-from selenium.webdriver.common.by import By
+from sitemap_crawler import SitemapCrawler, StreamingSitemapIndex, parse_page
+from webdriver_pool import get_webdriver_pool
 import streamlit_extras
 from streamlit_extras.add_vertical_space import add_vertical_space
 from streamlit_extras.row import row
@@ -35,6 +28,8 @@ llm = ChatOpenAI(
     temperature=0.1,
 )
 
+ANSWERS_MAX_CONCURRENCY = 8
+
 answers_prompt = ChatPromptTemplate.from_template(
     """
     Using ONLY the following context answer the user's question. If you can't just say you don't know, don't make anything up.
@@ -68,23 +63,20 @@ def get_answers(inputs):
     docs = inputs["docs"]
     question = inputs["question"]
     answers_chain = answers_prompt | llm
-    # answers = []
-    # for doc in docs:
-    #     result = answers_chain.invoke(
-    #         {"question": question, "context": doc.page_content}
-    #     )
-    #     answers.append(result.content)
+    # Score every doc in one concurrent batch instead of one LLM call after another
+    results = answers_chain.batch(
+        [{"question": question, "context": doc.page_content} for doc in docs],
+        config={"max_concurrency": ANSWERS_MAX_CONCURRENCY},
+    )
     return {
         "question": question,
         "answers": [
             {
-                "answer": answers_chain.invoke(
-                    {"question": question, "context": doc.page_content}
-                ).content,
+                "answer": result.content,
                 "source": doc.metadata["source"],
                 "date": doc.metadata["lastmod"],
             }
-            for doc in docs
+            for doc, result in zip(docs, results)
         ],
     }
 
@@ -124,35 +116,18 @@ def choose_answer(inputs):
     )
 
 
-def parse_page(soup):
-    header = soup.find("header")
-    footer = soup.find("footer")
-    if header:
-        header.decompose()
-    if footer:
-        footer.decompose()
-    return (
-        str(soup.get_text())
-        .replace("\n", " ")
-        .replace("\xa0", " ")
-        .replace("CloseSearch Submit Blog", "")
-    )
-
-
-@st.cache_data(show_spinner="Loading website...")
-def load_sitemap(url):
+@st.cache_resource(show_spinner="Loading website...")
+def load_sitemap(url, _requests_per_second):
     splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
         chunk_size=1000,
         chunk_overlap=200,
     )
-    loader = SitemapLoader(
-        url,
-        parsing_function=parse_page,
+    crawler = SitemapCrawler(
+        parse_page,
+        requests_per_second=_requests_per_second,
     )
-    loader.requests_per_second = 2
-    docs = loader.load_and_split(text_splitter=splitter)
-    vector_store = FAISS.from_documents(docs, OpenAIEmbeddings())
-    return vector_store.as_retriever()
+    index = StreamingSitemapIndex(url, crawler, splitter, OpenAIEmbeddings())
+    return index.start()
     
 
 st.markdown(
@@ -171,31 +146,21 @@ with st.sidebar:
         "Write down a URL",
         placeholder="https://example.com",
     )
+    requests_per_second = st.slider(
+        "Requests per second (per host)",
+        min_value=1,
+        max_value=20,
+        value=2,
+    )
 
 
 def start_chromium(url):
-    # ドライバのオプション
-    options = ChromeOptions()
-
-    # option設定を追加（設定する理由はメモリの削減）
-    options.add_argument("--headless")
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-
-    # webdriver_managerによりドライバーをインストール
-    # chromiumを使用したいのでchrome_type引数でchromiumを指定しておく
-    CHROMEDRIVER = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
-    service = fs.Service(CHROMEDRIVER)
-    driver = webdriver.Chrome(
-                              options=options,
-                              service=service
-                             )
-
-    # URLで指定したwebページを開く
-    driver.get(url)
-    html = driver.page_source
-    driver.close()
+    # Browsers come from a pool shared by every session, so only the first
+    # request pays for resolving chromedriver and starting Chromium.
+    with get_webdriver_pool().driver() as driver:
+        # URLで指定したwebページを開く
+        driver.get(url)
+        html = driver.page_source
     return html
 
 
@@ -251,8 +216,7 @@ def convert_html_to_csv(html):
 if url:
     if ".xml" not in url:
         result = start_chromium(url)
-        html_content = start_chromium(url)
-        document = Document(page_content=html_content)
+        document = Document(page_content=result)
         transformed = Html2TextTransformer().transform_documents([document])
 
 
@@ -286,7 +250,22 @@ if url:
             st.text_area("", transformed, height=300)
 
     else:
-        retriever = load_sitemap(url)
+        index = load_sitemap(url, requests_per_second)
+        with st.sidebar:
+            if st.button("Refresh index", disabled=not index.done.is_set()):
+                index.crawler.requests_per_second = requests_per_second
+                index.refresh()
+        if not index.ready.is_set():
+            with st.spinner("Indexing the first pages..."):
+                index.ready.wait()
+        if index.error:
+            st.error(f"Failed to crawl the sitemap: {index.error}")
+        elif not index.done.is_set():
+            st.caption(
+                f"Still crawling: {index.indexed} of {index.crawler.total} pages indexed. "
+                "Answers use the pages indexed so far."
+            )
+        retriever = index.as_retriever()
         query = st.text_input("Ask a question to the website.")
         if query:
             chain = (
@@ -14,18 +14,9 @@ from langchain.document_transformers import Html2TextTransformer
 from langchain.schema import Document
 from langchain.storage import LocalFileStore
 import requests
-from bs4 import BeautifulSoup
-import re
 import threading
-from threading import Thread, Event
 import streamlit as st
-from selenium import webdriver
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome import service as fs
-from selenium.webdriver import ChromeOptions
-from webdriver_manager.core.os_manager import ChromeType
 from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager, ChromeType
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoAlertPresentException, TimeoutException, WebDriverException
@@ -34,14 +25,22 @@ from selenium.common.exceptions import NoSuchElementException
 from streamlit_extras.add_vertical_space import add_vertical_space
 from streamlit_extras.row import row
 from Google import Create_Service
-from queue import Queue
+from webdriver_pool import get_webdriver_pool
+from moyo_fetch import discover_plan_urls, fetch_plan_page, is_complete, response_text
+from moyo_parse import PendingRow, parse, parse_rendered_html
+from sheet_writer import SheetWriter
+from plan_store import PlanStore, SheetsExporter
+from job_runner import DONE, QUEUED, RUNNING, get_job_runner
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import partial
+from queue import Empty, Queue
 import time
-from ratelimit import limits, sleep_and_retry
 import traceback
 from datetime import datetime
 import pytz
-from multiprocessing import Process, Manager
-import psutil
+import pandas as pd
+from crawl_journal import FAILED, FETCHED, WRITTEN, CrawlJournal
 
 
 
@@ -68,8 +67,8 @@ def googleSheetConnect():
     serviceInstance = Create_Service(CLIENT_SECRETS, API_NAME, API_VERSION, SCOPES)
     return serviceInstance
 
-def create_new_google_sheet(is_just_moyos, url1=None, url2=None):
-    serviceInstance = googleDriveConnect()
+def create_new_google_sheet(is_just_moyos, url1=None, url2=None, serviceInstance=None):
+    serviceInstance = serviceInstance if serviceInstance else googleDriveConnect()
     
     if not is_just_moyos:
         part1 = url1.split('/')
@@ -109,26 +108,6 @@ def pushToSheet(data, sheet_id, range='Sheet1!A:A', serviceInstance=None):
             body=body
         ).execute()
 
-        # CPU usage
-        cpu_percent = psutil.cpu_percent()
-
-        # Virtual (Physical) Memory
-        memory_info = psutil.virtual_memory()
-        memory_percent = memory_info.percent  # Memory usage in percent
-        # Correct calculation for used and total memory in MB
-        memory_used_mb = memory_info.used / (1024 ** 2)  # Convert from bytes to MB
-        memory_total_mb = memory_info.total / (1024 ** 2)  # Convert from bytes to MB
-
-        # Swap Memory
-        swap_info = psutil.swap_memory()
-        # Correct calculation for used and total swap in MB
-        swap_used_mb = swap_info.used / (1024 ** 2)  # Convert from bytes to MB
-        swap_total_mb = swap_info.total / (1024 ** 2)  # Convert from bytes to MB
-
-        print(f"CPU: {cpu_percent}%, Physical Memory: {memory_percent}%")
-        print(f"Physical Memory Used: {memory_used_mb:.2f} MB, Total: {memory_total_mb:.2f} MB")
-        print(f"Swap Used: {swap_used_mb:.2f} MB, Total: {swap_total_mb:.2f} MB")
-
         return result, serviceInstance
     except Exception as e:
         # Re-raise the exception to be caught in the calling function
@@ -280,125 +259,6 @@ st.markdown(
 """
 )
 
-def regex_extract(strSoup):
-    # Existing patterns
-    mvno_pattern = r"\[(.*?)\]"
-    plan_name_pattern = r"\]\s*(.*?)\s*\|"
-    monthly_fee_pattern = r"\|\s*([\d,]+원)\s*\|"
-    monthly_data_pattern = r"월\s*([.\d]+(?:GB|MB))"
-    daily_data_pattern = r"매일\s*([.\d]+(?:GB|MB))"
-    data_speed_pattern = r"\(([.\d]+(?:mbps|gbps))\)"
-    call_minutes_pattern = r"(\d+분|무제한)"
-    text_messages_pattern = r"(\d+건|무제한)"
-    carrier_pattern = r"(LG U\+|SKT|KT)"
-    network_type_pattern = r"(LTE|3G|4G|5G)"
-    discount_info_pattern = r"(\d+개월\s*이후\s*[\d,]+원)"
-
-    # New patterns
-    between_contract_and_call_pattern = r"(?<=통신사 약정)(.*?)(?=통화|펼쳐보기)"
-    between_number_transfer_fee_and_sim_delivery_pattern = r"(?<=번호이동 수수료)(.*?)(?=일반 유심 배송)"
-    between_sim_delivery_pattern_and_nfc_sim = r"(?<=일반 유심 배송)(.*?)(?=NFC 유심 배송)"
-    between_nfc_sim_and_esim_pattern = r"(?<=NFC 유심 배송)(.*?)(?=eSIM)"
-    between_esim_and_support_pattern = r"(?<=eSIM)(.*?)(?=지원(?! 안함| 안 함))"
-
-    # New patterns for 지원 and 미지원
-    pattern_support_with_boundary = r'지원\s*(.*?)\s*미지원'
-    pattern_no_support_with_boundary = r'미지원\s*(.*?)\s*(접기|기본)'
-
-    # Extracting information using existing patterns
-    mvno = re.search(mvno_pattern, strSoup)
-    plan_name = re.search(plan_name_pattern, strSoup)
-    monthly_fee = re.search(monthly_fee_pattern, strSoup)
-    monthly_data = re.search(monthly_data_pattern, strSoup)
-    daily_data = re.search(daily_data_pattern, strSoup)
-    data_speed = re.search(data_speed_pattern, strSoup)
-    call_minutes = re.search(call_minutes_pattern, strSoup)
-    text_messages = re.search(text_messages_pattern, strSoup)
-    carrier = re.search(carrier_pattern, strSoup)
-    network_type = re.search(network_type_pattern, strSoup)
-    discount_info = re.search(discount_info_pattern, strSoup)
-
-    # Extracting information using new patterns
-    between_contract_and_call = re.search(between_contract_and_call_pattern, strSoup)
-    between_number_transfer_fee_and_sim_delivery = re.search(between_number_transfer_fee_and_sim_delivery_pattern, strSoup)
-    between_sim_delievery_and_nfc_sim = re.search(between_sim_delivery_pattern_and_nfc_sim, strSoup)
-    between_nfc_sim_and_esim = re.search(between_nfc_sim_and_esim_pattern, strSoup)
-    between_esim_and_support = re.search(between_esim_and_support_pattern, strSoup)
-
-    # Extracting 지원 and 미지원 information
-    text_support_boundary = re.search(pattern_support_with_boundary, strSoup, re.DOTALL)
-    text_no_support_boundary = re.search(pattern_no_support_with_boundary, strSoup, re.DOTALL)
-
-    # Function to format the extracted text based on the user's requirements
-    def format_extracted_categories(matches, categories):
-        formatted = []
-        for category in categories:
-            for match in matches:
-                if category in match:
-                    start_index = match.find(category)
-                    end_index = min([match.find(cat, start_index + 1) for cat in categories if cat in match[start_index + 1:]] + [len(match)])
-                    additional_text = match[start_index + len(category):end_index].strip()
-                    formatted_text = f"{category}: {additional_text}" if additional_text else category
-                    formatted.append(formatted_text)
-                    break
-        return ', '.join(formatted)
-
-    # Categories for 지원 and 미지원
-    categories_support = ['모바일 핫스팟', '소액 결제', '해외 로밍', '인터넷 결합', '데이터 쉐어링']
-    categories_no_support = ['모바일 핫스팟', '소액 결제', '해외 로밍', '인터넷 결합', '데이터 쉐어링']
-
-    # Formatting the support and no support texts
-    formatted_text_support = format_extracted_categories([text_support_boundary.group(1) if text_support_boundary else ""], categories_support)
-    formatted_text_no_support = format_extracted_categories([text_no_support_boundary.group(1) if text_no_support_boundary else ""], categories_no_support)
-
-    사은품_pattern = {
-        "사은품 및 이벤트": r"사은품 및 이벤트\s*([^\n]+?)(?=대상:)",  # Adjusted to ensure full capture up to "대상:"
-        "대상": r"대상:\s*([^지급시기]+)",  # Ensure capturing stops correctly before "지급시기"
-        "지급시기": r"지급시기:\s*([^\n]+?)(?=요금제 개통 절차)"  # Ensure capturing stops correctly before "요금제 개통 절차"
-    }
-    
-    def extract_and_format_info(text, patterns):
-        formatted_results = []
-        for key, pattern in patterns.items():
-            match = re.search(pattern, text, re.DOTALL)
-            if match and match.group(1).strip():
-                value = match.group(1).strip()
-            else:
-                formatted_results.append("제공안함")
-                break
-            formatted_results.append(f"{key}: {value}")
-        return ', '.join(formatted_results)
-
-
-    formatted_사은품_info = extract_and_format_info(strSoup, 사은품_pattern)
-
-    카드_할인 = r"카드 결합 할인\s*(.*?)할인"
-    카드_할인_정보 = re.search(카드_할인, strSoup)
-
-
-    return [
-        mvno.group(1) if mvno else "제공안함", 
-        plan_name.group(1) if plan_name else "제공안함", 
-        monthly_fee.group(1) if monthly_fee else "제공안함", 
-        monthly_data.group(1) if monthly_data else "제공안함", 
-        daily_data.group(1) if daily_data else "제공안함", 
-        data_speed.group(1) if data_speed else "제공안함", 
-        call_minutes.group(1) if call_minutes else "제공안함", 
-        text_messages.group(1) if text_messages else "제공안함", 
-        carrier.group(1) if carrier else "제공안함", 
-        network_type.group(1) if network_type else "제공안함", 
-        discount_info.group(1) if discount_info else "제공안함",
-        between_contract_and_call.group(1) if between_contract_and_call else "제공안함",
-        between_number_transfer_fee_and_sim_delivery.group(1) if between_number_transfer_fee_and_sim_delivery else "제공안함",
-        between_sim_delievery_and_nfc_sim.group(1) if between_sim_delievery_and_nfc_sim else "제공안함",
-        between_nfc_sim_and_esim.group(1) if between_nfc_sim_and_esim else "제공안함",
-        between_esim_and_support.group(1) if between_esim_and_support else "제공안함",
-        formatted_text_support if formatted_text_support else "제공안함",
-        formatted_text_no_support if formatted_text_no_support else "제공안함",
-        formatted_사은품_info,
-        카드_할인_정보.group(1) + "할인" if 카드_할인_정보 else "제공안함", 
-    ]
-
 def update_google_sheet(data, sheet_id, serviceInstance=None):
     pushToSheet(data, sheet_id, range='Sheet1!A:B', serviceInstance=serviceInstance)
 
@@ -425,138 +285,279 @@ def sort_sheet_by_column(sheet_id, column_index=0, serviceInstance=None):
     }
     serviceInstance.spreadsheets().batchUpdate(spreadsheetId=sheet_id, body=body).execute()
 
-error_queue = Queue()
-log_queue = Queue()
-thread_completed = Event()
-stop_signal = Event()
+@st.cache_resource
+def crawl_journal():
+    """One journal, and so one SQLite connection, for every session and rerun."""
+    return CrawlJournal()
+
+
+@st.cache_resource
+def plan_store():
+    return PlanStore()
 
 
-def fetch_data(driver, url_queue, data_queue):
+journal = crawl_journal()
+store = plan_store()
+runner = get_job_runner()
+# Pages of one fetch thread that are parsed in the pool while it fetches the next ones
+PARSE_WINDOW = 4
+# Seconds a fetch thread waits for its next url while parses of its pages are pending
+PARSE_POLL = 0.2
+
+
+def start_fetch_fast(url):
+    """Fetch the server-rendered plan page; returns the Future of its parse, or None."""
     try:
-        while not url_queue.empty():
-            url = url_queue.get()
-            # Fetch and process data from the URL
-            driver.get(url)
+        return fetch_plan_page(url)
+    except requests.RequestException as e:
+        print(f"Fast fetch failed for {url}: {e}")
+        return None
 
+
+def fetch_data_fast(url, page, with_status=True):
+    """
+    Build the plan row from the parse Future of `start_fetch_fast`.
+    Returns None when the page needs the browser, e.g. the 펼쳐보기 sections are missing.
+    """
+    if page is None:
+        return None
+    try:
+        page = page.result()
+    except Exception as e:
+        print(f"Parsing {url} failed: {e}")
+        return None
+    planUrl = str(url)
+    if page["error"]:
+        if not with_status:
+            return None
+        return [planUrl] + ["-"] * 19 + [page["error"]]
+    regex_formula = page["row"]
+    if not is_complete(regex_formula):
+        return None
+    if regex_formula[18] != "제공안함" and page["사은품_링크"] is not None:
+        regex_formula[18] += (f", link:{page['사은품_링크']}")
+    if regex_formula[19] != "제공안함" and page["카드할인_링크"] is not None:
+        regex_formula[19] += (f", link:{page['카드할인_링크']}")
+    data = [planUrl] + regex_formula
+    if with_status:
+        data.append("종료 되었습니다" if page["expired"] else "서비스 중입니다")
+    return data
+
+
+def fetch_fast(next_url, with_status=True, window=PARSE_WINDOW):
+    """
+    Yield (url, row) for the urls of `next_url(timeout)` until it returns None, the
+    row being None when the page needs the browser. Up to `window` pages are parsed
+    in the pool while this thread fetches the next ones, and each row is yielded as
+    soon as its parse finishes: while parses are pending `next_url` is only waited
+    on for `PARSE_POLL` seconds, and raises queue.Empty when nothing came.
+    """
+    pending = deque()
+    exhausted = False
+    while pending or not exhausted:
+        finished = [item for item in pending if item[1] is None or item[1].done()]
+        if finished:
+            for item in finished:
+                pending.remove(item)
+                url, page = item
+                yield url, fetch_data_fast(url, page, with_status)
+            continue
+        if not exhausted and len(pending) < window:
             try:
-                WebDriverWait(driver, 3).until(EC.alert_is_present())
-                driver.switch_to.alert.accept()
-                alert_present = True
-            except (NoAlertPresentException, TimeoutException):
-                alert_present = False
-            expired = None
-            result = ""
-            if alert_present:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.text, 'html.parser')
-                    strSoup = soup.get_text()
-                    expired = "종료 되었습니다"
-
-            else: 
+                url = next_url(PARSE_POLL if pending else None)
+            except Empty:
+                continue
+            if url is None:
+                exhausted = True
+            else:
+                pending.append((url, start_fetch_fast(url)))
+            continue
+        wait([page for _, page in pending], return_when=FIRST_COMPLETED)
+
+
+def rendered_row(url, parsed, 사은품_링크, 카드할인_링크, status=()):
+    """Plan row from the parse_rendered_html result of a browser page, with its links."""
+    regex_formula = parsed["row"]
+    if regex_formula[18] != "제공안함" and 사은품_링크 is not None:
+        regex_formula[18] += (f", link:{사은품_링크}")
+    if regex_formula[19] != "제공안함" and 카드할인_링크 is not None:
+        regex_formula[19] += (f", link:{카드할인_링크}")
+    return [str(url)] + regex_formula + list(status)
+
+
+def fetch_data(job, url_queue, data_queue, crawl_id):
+    pool = get_webdriver_pool()
+    url = None
+
+    def next_url(timeout):
+        try:
+            return url_queue.get_nowait()
+        except Empty:
+            return None
+
+    try:
+        # Most plan pages are complete without JavaScript, only escalate to Chromium when not
+        for url, data in fetch_fast(next_url):
+            if data is not None:
+                data_queue.put(data)
+                job.metrics.count("fetched")
+                journal.mark(crawl_id, [url], FETCHED)
+                url_queue.task_done()
+                if job.cancelled():
+                    break
+                continue
+            with pool.driver() as driver:
+                # Fetch and process data from the URL
+                driver.get(url)
+
                 try:
+                    WebDriverWait(driver, 3).until(EC.alert_is_present())
+                    driver.switch_to.alert.accept()
+                    alert_present = True
+                except (NoAlertPresentException, TimeoutException):
+                    alert_present = False
+                expired = None
+                result = ""
+                사은품_링크 = 카드할인_링크 = None
+                if alert_present:
+                    response = requests.get(url)
+                    if response.status_code == 200:
+                        html = response_text(response)
+                        expired = "종료 되었습니다"
+
+                else: 
+                    try:
+                        # The error banner decides what to click next, so this one is waited for
+                        result = parse(parse_rendered_html, driver.page_source).result()["error"]
+                    except Exception as e:
+                        error_message = f"An error occurred when fetching data of: {e}"
+                        job.error(error_message)
+                    driver.refresh()
+                    if result is "":
+                        WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CLASS_NAME, "css-yg1ktq")))
+                        # button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
+                        # ActionChains(driver).move_to_element(button).click(button).perform()
+                        button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
+                        driver.execute_script("arguments[0].click();", button)
+                        WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'css-1ipix51')))
                     html = driver.page_source
-                    soup = BeautifulSoup(html, 'html.parser')
-                    strSoup = soup.get_text()
-                    pattern1 = r"서버에 문제가 생겼어요"
-                    pattern2 = r"존재하지 않는 요금제에요"
-
-                    # Combine patterns with | which acts as logical OR
-                    combined_pattern = pattern1 + "|" + pattern2
-
-                    # Searching for the combined pattern in the text
-                    match = re.search(combined_pattern, strSoup)
-                    result = match.group() if match else ""
-                except Exception as e:
-                    error_message = f"An error occurred when fetching data of: {e}"
-                    error_queue.put(error_message)
-                driver.refresh()
-                if result is "":
-                    WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.CLASS_NAME, "css-yg1ktq")))
-                    # button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
-                    # ActionChains(driver).move_to_element(button).click(button).perform()
-                    button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
-                    driver.execute_script("arguments[0].click();", button)
-                    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CLASS_NAME, 'css-1ipix51')))
-                html = driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
-                try:
-                    사은품_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-1hdj7cf.e17wbb0s4')
-                    사은품_링크 = 사은품_링크.get_attribute('href') if 사은품_링크 else None
-                except NoSuchElementException:
-                    사은품_링크 = None
+                    try:
+                        사은품_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-1hdj7cf.e17wbb0s4')
+                        사은품_링크 = 사은품_링크.get_attribute('href') if 사은품_링크 else None
+                    except NoSuchElementException:
+                        사은품_링크 = None
 
 
-                try:
-                    카드할인_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-pnutty.ema3yz60')
-                    카드할인_링크 = 카드할인_링크.get_attribute('href') if 카드할인_링크 else None
-                except NoSuchElementException:
-                    카드할인_링크 = None
+                    try:
+                        카드할인_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-pnutty.ema3yz60')
+                        카드할인_링크 = 카드할인_링크.get_attribute('href') if 카드할인_링크 else None
+                    except NoSuchElementException:
+                        카드할인_링크 = None
                 
-                strSoup = soup.get_text()
-                expired = "서비스 중입니다"
-
-            # if export_to_google_sheet:
-            if result is "":
-                regex_formula = regex_extract(strSoup)
-                planUrl = str(url)
-                if regex_formula[18] is not "제공안함" and 사은품_링크 is not None:
-                    regex_formula[18] += (f", link:{사은품_링크}")
-                if regex_formula[19] is not "제공안함" and 카드할인_링크 is not None:
-                    regex_formula[19] += (f", link:{카드할인_링크}")
-                data = [planUrl] + regex_formula + [expired]
-            else:
-                planUrl = str(url)
-                data = [ planUrl,"-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-"]
-                data.append(f"{result}")
-            # Put the processed data into the data queue
-            data_queue.put(data)
-            driver.delete_all_cookies()
+                    expired = "서비스 중입니다"
+
+                # if export_to_google_sheet:
+                if result is "":
+                    # Parsed in the pool while this thread moves on, the store stage waits for it
+                    data = PendingRow(
+                        url,
+                        parse(parse_rendered_html, html),
+                        partial(rendered_row, url, 사은품_링크=사은품_링크, 카드할인_링크=카드할인_링크, status=[expired]),
+                    )
+                else:
+                    planUrl = str(url)
+                    data = [ planUrl,"-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-","-"]
+                    data.append(f"{result}")
+                # Put the processed data into the data queue
+                data_queue.put(data)
+                job.metrics.count("fetched")
+                job.metrics.count("browser")
+                journal.mark(crawl_id, [url], FETCHED)
             url_queue.task_done()
-            if stop_signal.is_set():
+            if job.cancelled():
                 break
     except Exception as e:
         # Log the exception or handle it as needed
         error_message = f"An error occurred when fetching data of {url}: {e}"
-        error_queue.put(error_message)
-    finally:
-        driver.quit()
+        job.error(error_message)
+        if url is not None:
+            journal.mark(crawl_id, [url], FAILED, str(e))
 
-PER_MINUTE_LIMIT = 60
-@sleep_and_retry
-@limits(calls=PER_MINUTE_LIMIT, period=60)
-def rate_limited_pushToSheet(data, sheet_id, range, serviceInstance=None):
-    pushToSheet(data, sheet_id, range, serviceInstance)
+def record_stored(job, crawl_id, rows):
+    store.add_rows(crawl_id, rows)
+    job.metrics.count("stored", len(rows))
+    journal.mark(crawl_id, [row[0] for row in rows], WRITTEN)
 
-def update_sheet(data_queue, sheet_update_lock, sheet_id, serviceInstance=None):
-    while True:
-        batch_data = []  # Accumulate data here
-        while len(batch_data) < 10:  # Wait until we have 10 records
-            processed_data = data_queue.get()
-            if processed_data is None:  # Sentinel value to indicate completion
-                if len(batch_data) > 0:  # Push any remaining records
-                    with sheet_update_lock:
-                        retry_push_to_sheet(batch_data, sheet_id, 'Sheet1!A:B', serviceInstance)
-                return  # Exit after processing all data
-            batch_data.append(processed_data)  # Add data to the batch
-
-        # Push batch_data to Google Sheet with retries
-        with sheet_update_lock:
-            retry_push_to_sheet(batch_data, sheet_id, 'Sheet1!A:B', serviceInstance)
-        if stop_signal.is_set():
-            break
-
-def retry_push_to_sheet(data, sheet_id, range, serviceInstance, backoff_factor=1):
-    """Attempt to push data to the sheet indefinitely until successful, with exponential backoff."""
+
+def store_rows(job, data_queue, crawl_id, batch_size=500, flush_interval=1.0):
+    """
+    Consume fetched rows into the local store, one transaction per batch or per
+    `flush_interval`. Rows still being parsed (PendingRow) are waited for here.
+    """
+    batch, deadline = [], None
     while True:
+        timeout = None if deadline is None else max(deadline - time.monotonic(), 0)
         try:
-            print("Attempting to push data to sheet")
-            rate_limited_pushToSheet(data, sheet_id, range, serviceInstance)
-            print("Data successfully pushed to sheet")
-            break  # Success! Break out of the loop.
-        except Exception as e:
-            wait_time = backoff_factor # Exponential backoff
-            time.sleep(wait_time)
+            row = data_queue.get(timeout=timeout)
+        except Empty:
+            record_stored(job, crawl_id, batch)
+            batch, deadline = [], None
+            continue
+        if row is None:  # Sentinel value to indicate completion
+            if batch:
+                record_stored(job, crawl_id, batch)
+            return
+        if isinstance(row, PendingRow):
+            try:
+                row = row.result()
+            except Exception as e:
+                job.error(f"An error occurred when parsing {row.url}: {e}")
+                journal.mark(crawl_id, [row.url], FAILED, str(e))
+                continue
+        batch.append(row)
+        if deadline is None:
+            deadline = time.monotonic() + flush_interval
+        if len(batch) >= batch_size:
+            record_stored(job, crawl_id, batch)
+            batch, deadline = [], None
+
+
+def start_export(job, sheet_id, crawl_id, serviceInstance=None, start_row=2):
+    """Export the stored rows to the sheet in the background, while the crawl goes on at disk speed."""
+    serviceInstance = serviceInstance if serviceInstance else googleSheetConnect()
+    writer = SheetWriter(
+        sheet_id, serviceInstance, start_row=start_row, on_write=lambda rows: job.metrics.count("exported", len(rows))
+    )
+    exporter = SheetsExporter(store, crawl_id, writer)
+
+    def export():
+        exporter.run(job.cancel_event)
+        job.log(
+            f"Exported {writer.rows_written} rows in {writer.requests_made} requests "
+            f"({writer.rows_per_second:.1f} rows/s)"
+        )
+        if exporter.rows_failed:
+            job.error(
+                f"{exporter.rows_failed} rows could not be written to the sheet. They are kept in the "
+                f"local store and the crawl stays unfinished; resume it to export them."
+            )
+
+    thread = threading.Thread(target=export)
+    thread.start()
+    return exporter, thread
+
+
+def finish_crawl(job, crawl_id, exporter, export_thread):
+    """Wait for the export; returns whether the crawl could be closed."""
+    # The crawl itself is complete here, only the Sheets export may still be catching up
+    job.update(crawl_finished=True)
+    exporter.crawl_done.set()
+    export_thread.join()
+    # A crawl stays resumable until every url is stored and every row is in the sheet
+    counts = store.counts(crawl_id)
+    if counts["stored"] != counts["exported"] or exporter.writer.spill.pending(exporter.writer.sheet_id):
+        return False
+    return journal.finish(crawl_id)
 
 
 # def update_sheet(data_queue, sheet_update_lock, sheet_id, serviceInstance=None):
@@ -597,7 +598,7 @@ def retry_push_to_sheet(data, sheet_id, range, serviceInstance, backoff_factor=1
 
 
 
-def moyocrawling(url1, url2, sheet_id, serviceInstance):
+def moyocrawling(job, url1, url2, sheet_id, serviceInstance, crawl_id, resume=False, start_row=2):
     part1 = url1.split('/')
     part2 = url2.split('/')
     try:
@@ -608,201 +609,136 @@ def moyocrawling(url1, url2, sheet_id, serviceInstance):
 
     url_queue = Queue()
     data_queue = Queue()
-    sheet_update_lock = threading.Lock()
+    job.metrics.watch_queue("url_queue", url_queue)
+    job.metrics.watch_queue("data_queue", data_queue)
 
-    # Populate the URL queue
-    for i in range(number1, number2 + 1):
-        current_url = '/'.join(part1[:-1] + [str(i)])
+    # Populate the URL queue, only with what never reached the sheet when resuming
+    if resume:
+        urls = journal.unfinished(crawl_id)
+    else:
+        urls = ['/'.join(part1[:-1] + [str(i)]) for i in range(number1, number2 + 1)]
+        journal.add_urls(crawl_id, urls)
+    for current_url in urls:
         url_queue.put(current_url)
 
-    def setup_driver():
-        options = ChromeOptions()
-        options.add_argument("--headless")
-        options.add_argument('--disable-gpu')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-extensions')
-        # options.add_argument("window-size=800x2000")
-        prefs = {"profile.managed_default_content_settings.images": 2}
-        options.add_experimental_option("prefs", prefs)
-
-        CHROMEDRIVER = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
-        service = fs.Service(CHROMEDRIVER)
-        driver = webdriver.Chrome(
-                                options=options,
-                                service=service
-                                )
-        return driver
-
      # Start data fetching threads
     fetch_threads = []
     for _ in range(3):
-        driver = setup_driver()  # Each thread gets its own driver instance
-        t = threading.Thread(target=fetch_data, args=(driver, url_queue, data_queue))
+        t = threading.Thread(target=fetch_data, args=(job, url_queue, data_queue, crawl_id))
         t.start()
         fetch_threads.append(t)
 
-    # Start sheet updating threads
-    update_threads = []
-    for _ in range(1):
-        t = threading.Thread(target=update_sheet, args=(data_queue, sheet_update_lock, sheet_id, serviceInstance))
-        t.start()
-        update_threads.append(t)
+    # Store rows locally first, the sheet is filled from the store in the background
+    store_thread = threading.Thread(target=store_rows, args=(job, data_queue, crawl_id))
+    store_thread.start()
+    exporter, export_thread = start_export(job, sheet_id, crawl_id, serviceInstance, start_row)
 
-    # Wait for data fetching threads to finish and signal update threads to finish
+    # Wait for data fetching threads to finish and signal the store thread to finish
     for thread in fetch_threads:
         thread.join()
-    for _ in range(2):
-        data_queue.put(None)  # Sentinel value for each update thread
-
-    # Wait for update threads to finish
-    for thread in update_threads:
-        thread.join()
-    autoResizeColumns(sheet_id, 0, serviceInstance)
-    thread_completed.set()
-    if stop_signal.is_set():
+    data_queue.put(None)  # Sentinel value for the store thread
+    store_thread.join()
+    # Sorting moves rows, so only a closed crawl, which writes no more rows, is sorted
+    if finish_crawl(job, crawl_id, exporter, export_thread):
+        autoResizeColumns(sheet_id, 0, serviceInstance)
+    if job.cancelled():
         return
 
-def fetch_url_Just_Moyos(url_fetch_queue):
-    end_of_list = False
-    i = 1
-    base_url = "https://www.moyoplan.com"
-    while not end_of_list:
-        attempts = 0  # Initialize attempts counter
-        while attempts < 5:  # Attempt to fetch data up to 5 times
-            try:
-                BaseUrl = "https://www.moyoplan.com/plans"  # Remove any trailing slash
-                planListUrl = f"{BaseUrl}?page={i}"  
-                response = requests.get(planListUrl)
-                if response.status_code != 200:
-                    error_message = f"Failed to fetch data from {planListUrl}. Status code: {response.status_code}"
-                    error_queue.put(error_message)
-                    attempts += 1
-                    if attempts >= 5:
-                        error_queue.put(f"Max attempts reached for {planListUrl}. Skipping...")
-                        break
-                soup = BeautifulSoup(response.text, 'html.parser')
-                a_tags = soup.find_all('a', class_='e3509g015')
-                if not a_tags:  # If no a_tags found, possibly end of list
-                    end_of_list = True
-                    break  # Break out of the inner loop
-                for a_tag in a_tags:
-                    link = a_tag['href']
-                    plan_detail_url = f"{base_url}{link}"
-                    url_fetch_queue.put(plan_detail_url)  # Put each link into the queue individually
-                i += 1  # Increment page number
-            except Exception as e:
-                error_queue.put(str(e))
-                attempts += 1  # Increment attempts counter
-            if attempts >= 5:
-                break  # Break out of the outer loop if max attempts reached
-        if stop_signal.is_set():
-            break 
-    print(f"URL Fetch Thread Finished at page = {i}//////////////////////////////////////////////////////////////////")
-
-def setup_driver():
-    options = ChromeOptions()
-    options.add_argument("--headless")
-    options.add_argument('--disable-gpu')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-extensions')
-    # options.add_argument('window-size=800x2000')  # Adjust as needed
-    prefs = {"profile.managed_default_content_settings.images": 2}
-    options.add_experimental_option("prefs", prefs)
-
-    CHROMEDRIVER = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
-    service = fs.Service(CHROMEDRIVER)
-    driver = webdriver.Chrome(
-                            options=options,
-                            service=service
-                            )
-    return driver
-
-
-def fetch_data_Just_Moyos(url_fetch_queue, data_queue):
+def fetch_url_Just_Moyos(job, url_fetch_queue, crawl_id, resume=False):
+    found = 0
     try:
-        driver = setup_driver()
-        base_url = "https://www.moyoplan.com/plans"
-        driver.get(base_url)
-        while not url_fetch_queue.empty():
-            url = url_fetch_queue.get()
+        if resume:
+            for plan_detail_url in journal.unfinished(crawl_id):
+                url_fetch_queue.put(plan_detail_url)
+        for plan_detail_url in discover_plan_urls(on_error=job.error, should_stop=job.cancelled):
+            # Urls already in the journal are either written or were re-enqueued above
+            if not journal.add_urls(crawl_id, [plan_detail_url]):
+                continue
+            url_fetch_queue.put(plan_detail_url)  # Put each link into the queue individually
+            job.metrics.count("discovered")
+            found += 1
+    except Exception as e:
+        job.error(str(e))
+    print(f"URL Fetch Thread Finished with {found} plans//////////////////////////////////////////////////////////////////")
+
+def fetch_data_Just_Moyos(job, url_fetch_queue, data_queue, crawl_id):
+    pool = get_webdriver_pool()
+    url = None
+    try:
+        # Block on the queue: discovery may still be probing the page count
+        next_url = lambda timeout: url_fetch_queue.get(timeout=timeout)
+        for url, data in fetch_fast(next_url, with_status=False):
             # Fetch and process data from the URL
             attempts = 0
-            fetch_success = False
+            if data is not None:
+                data_queue.put(data)
+                job.metrics.count("fetched")
+                journal.mark(crawl_id, [url], FETCHED)
+                print(f"Data queued for {url}")
+            fetch_success = data is not None
             
             while attempts < 5 and not fetch_success:
                 try: 
-                    driver.get(url)
-                    driver.refresh()
-                    WebDriverWait(driver, 15).until(EC.element_to_be_clickable((By.CLASS_NAME, "css-yg1ktq")))
-                    button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
-                    driver.execute_script("arguments[0].click();", button)
-                    # WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CLASS_NAME, 'css-1ipix51')))
-                    # div_css_selector = ".css-1b8xqgi"
-                    # div_element = WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.CSS_SELECTOR, div_css_selector)))
-
-                    # svg_element = WebDriverWait(driver, 15).until(EC.presence_of_element_located((By.XPATH, "/html/body/div[1]/div[2]/main/div/section[4]/div/div/div/div/div/div[1]/div[1]/div")))
-                    # hover = ActionChains(driver).move_to_element(svg_element)
-                    # hover.perform()
-                    # tooltip = WebDriverWait(driver, 15).until(EC.visibility_of_element_located((By.CSS_SELECTOR, 'span[role="tooltip"]')))
-                    try:
-                        사은품_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-1hdj7cf.e17wbb0s4')
-                        사은품_링크 = 사은품_링크.get_attribute('href') if 사은품_링크 else None
-                    except NoSuchElementException:
-                        사은품_링크 = None
-
-
-                    try:
-                        카드할인_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-pnutty.ema3yz60')
-                        카드할인_링크 = 카드할인_링크.get_attribute('href') if 카드할인_링크 else None
-                    except NoSuchElementException:
-                        카드할인_링크 = None
-
-                    html = driver.page_source
-                    soup = BeautifulSoup(html, 'html.parser')
-                    strSoup = soup.get_text()
-                    regex_formula = regex_extract(strSoup)
-                    if regex_formula[18] is not "제공안함" and 사은품_링크 is not None:
-                        regex_formula[18] += (f", link:{사은품_링크}")
-                    if regex_formula[19] is not "제공안함" and 카드할인_링크 is not None:
-                        regex_formula[19] += (f", link:{카드할인_링크}")
-                    planUrl = str(url)
-                    data = [planUrl] + regex_formula
+                    # A browser that raises is dropped by the pool and replaced on the next attempt
+                    with pool.driver() as driver:
+                        driver.get(url)
+                        driver.refresh()
+                        WebDriverWait(driver, 15).until(EC.element_to_be_clickable((By.CLASS_NAME, "css-yg1ktq")))
+                        button = driver.find_element(By.XPATH, "//button[contains(@class, 'css-yg1ktq')]")
+                        driver.execute_script("arguments[0].click();", button)
+                        try:
+                            사은품_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-1hdj7cf.e17wbb0s4')
+                            사은품_링크 = 사은품_링크.get_attribute('href') if 사은품_링크 else None
+                        except NoSuchElementException:
+                            사은품_링크 = None
+
+
+                        try:
+                            카드할인_링크 = driver.find_element(By.CSS_SELECTOR, 'a.css-pnutty.ema3yz60')
+                            카드할인_링크 = 카드할인_링크.get_attribute('href') if 카드할인_링크 else None
+                        except NoSuchElementException:
+                            카드할인_링크 = None
+
+                        html = driver.page_source
+                    data = PendingRow(
+                        url,
+                        parse(parse_rendered_html, html),
+                        partial(rendered_row, url, 사은품_링크=사은품_링크, 카드할인_링크=카드할인_링크),
+                    )
                     data_queue.put(data)
+                    job.metrics.count("fetched")
+                    job.metrics.count("browser")
+                    journal.mark(crawl_id, [url], FETCHED)
                     print(f"Data queued for {url}")
                     fetch_success = True
                     attempts = 0
                 except (TimeoutException, WebDriverException) as e:
                     attempts += 1
-                    if driver:
-                        driver.quit()
-                    driver = setup_driver()
-                    error_queue.put(f"Timeout occurred for {url}, attempt {attempts}. Retrying...")
+                    job.error(f"Timeout occurred for {url}, attempt {attempts}. Retrying...")
                     if attempts == 5:
                         error_message = f"Failed to fetch data after 5 attempts for URL: {url}"
-                        error_queue.put(error_message)
-            if stop_signal.is_set():
+                        job.error(error_message)
+                        journal.mark(crawl_id, [url], FAILED, str(e))
+            if job.cancelled():
                 break  
 
-            driver.delete_all_cookies()
             url_fetch_queue.task_done()
     except Exception as e:
         # Log the exception or handle it as needed
         error_message = f"An error occurred when fetching data of {url}: {e}"
-        error_queue.put(error_message)
-    finally:
-        if driver:
-            driver.quit()
+        job.error(error_message)
+        if url is not None:
+            journal.mark(crawl_id, [url], FAILED, str(e))
 
-def moyocrawling_Just_Moyos(sheet_id, sheetUrl, serviceInstance):
+def moyocrawling_Just_Moyos(job, sheet_id, sheetUrl, serviceInstance, crawl_id, resume=False, start_row=2):
     url_fetch_queue = Queue()
     data_queue = Queue()
-    sheet_update_lock = threading.Lock()
+    job.metrics.watch_queue("url_queue", url_fetch_queue)
+    job.metrics.watch_queue("data_queue", data_queue)
 
     fetch_url_threads = []
     for _ in range(1):
-        t = threading.Thread(target=fetch_url_Just_Moyos, args=(url_fetch_queue,))
+        t = threading.Thread(target=fetch_url_Just_Moyos, args=(job, url_fetch_queue, crawl_id, resume))
         t.start()
         fetch_url_threads.append(t)
     print("Fetch URL Thread Started/////////////////////////////////////////////////////////////////")
@@ -810,52 +746,37 @@ def moyocrawling_Just_Moyos(sheet_id, sheetUrl, serviceInstance):
     # Start data fetching threads
     fetch_threads = []
     for _ in range(3):
-        t = threading.Thread(target=fetch_data_Just_Moyos, args=(url_fetch_queue, data_queue))
+        t = threading.Thread(target=fetch_data_Just_Moyos, args=(job, url_fetch_queue, data_queue, crawl_id))
         t.start()
         fetch_threads.append(t)
     print("Fetch Data Thread Started/////////////////////////////////////////////////////////////////")
 
-    # Start sheet updating threads
-    update_threads = []
-    for _ in range(1):
-        t = threading.Thread(target=update_sheet, args=(data_queue, sheet_update_lock, sheet_id, serviceInstance))
-        t.start()
-        update_threads.append(t)
-    print("Update Thread Started/////////////////////////////////////////////////////////////////")
-
-    # process1 = Process(target=update_sheet, args=(data_queue, sheet_update_lock, sheet_id, serviceInstance))
-    # process2 = Process(target=update_sheet, args=(data_queue, sheet_update_lock, sheet_id, serviceInstance))
-
-    # # Start your processes
-    # process1.start()
-    # process2.start()
-
-    # # Wait for both processes to complete
-    # process1.join()
-    # process2.join()
+    # Store rows locally first, the sheet is filled from the store in the background
+    store_thread = threading.Thread(target=store_rows, args=(job, data_queue, crawl_id))
+    store_thread.start()
+    exporter, export_thread = start_export(job, sheet_id, crawl_id, serviceInstance, start_row)
+    print("Store and Export Threads Started/////////////////////////////////////////////////////////////////")
 
     # Wait for data url fetching threads to finish and signal fetch threads to finish
     for thread in fetch_url_threads:
         thread.join()
-    for _ in range(1):
-        url_fetch_queue.put(None)
+    for _ in fetch_threads:
+        url_fetch_queue.put(None)  # Sentinel value for each fetch thread
     print("URL Fetch Thread Finished/////////////////////////////////////////////////////////////////")
 
-    # Wait for data fetching threads to finish and signal update threads to finish
+    # Wait for data fetching threads to finish and signal the store thread to finish
     for thread in fetch_threads:
         thread.join()
-    for _ in range(1):
-        data_queue.put(None)  # Sentinel value for each update thread
+    data_queue.put(None)  # Sentinel value for the store thread
     print("Data Fetch Thread Finished/////////////////////////////////////////////////////////////////")
-    # Wait for update threads to finish
-    for thread in update_threads:
-        thread.join()
-    print("Update Thread Finished/////////////////////////////////////////////////////////////////")
-    autoResizeColumns(sheet_id, 0, serviceInstance)
-    print("Auto Resize Column Finished/////////////////////////////////////////////////////////////////")
-    thread_completed.set()
+    store_thread.join()
+    finished = finish_crawl(job, crawl_id, exporter, export_thread)
+    print("Export Thread Finished/////////////////////////////////////////////////////////////////")
+    if finished:
+        autoResizeColumns(sheet_id, 0, serviceInstance)
+        print("Auto Resize Column Finished/////////////////////////////////////////////////////////////////")
     print("All Threads Completed/////////////////////////////////////////////////////////////////")
-    if stop_signal.is_set():
+    if job.cancelled():
         return
     
 
@@ -880,6 +801,7 @@ with st.sidebar:
     if st.button("Start Crawling"):
         if url1 and url2:
             st.session_state['show_download_buttons'] = True
+            st.session_state['resume_crawl'] = None
             st.session_state['url1'] = url1
             st.session_state['url2'] = url2
             st.session_state['Just_Moyos'] = False
@@ -890,50 +812,129 @@ with st.sidebar:
 
     if st.button("Just Moyos"):
         st.session_state['show_download_buttons'] = True
+        st.session_state['resume_crawl'] = None
         st.session_state['BaseUrl'] = base_url
         st.session_state['Just_Moyos'] = True
 
+    # Leased crawls are left out; so are the crawls of this process's live jobs, whatever their lease
+    live_crawls = [job["progress"].get("crawl_id") for job in runner.list_jobs("moyo") if job["status"] in (QUEUED, RUNNING)]
+    unfinished_crawl = journal.latest_unfinished(exclude=filter(None, live_crawls))
+    if unfinished_crawl:
+        counts = journal.counts(unfinished_crawl["crawl_id"])
+        started = datetime.fromtimestamp(unfinished_crawl["created"], pytz.timezone('Asia/Seoul'))
+        st.caption(
+            f"Unfinished crawl from {started:%Y-%m-%d %H:%M}: "
+            + ", ".join(f"{state} {count}" for state, count in sorted(counts.items()))
+        )
+        if st.button("Resume last crawl"):
+            st.session_state['show_download_buttons'] = True
+            st.session_state['resume_crawl'] = unfinished_crawl["crawl_id"]
+            st.session_state['Just_Moyos'] = unfinished_crawl["kind"] == "just_moyos"
+            st.session_state['url1'] = unfinished_crawl["params"].get("url1")
+            st.session_state['url2'] = unfinished_crawl["params"].get("url2")
+
+
 
+def render_metrics(job):
+    samples = job.metrics.samples()
+    if not samples:
+        return
+    latest = samples[-1]
+    cols = st.columns(4)
+    cols[0].metric("CPU", f"{latest['cpu_percent']:.0f}%")
+    cols[1].metric("RSS (incl. Chromium)", f"{latest['rss_mb']:.0f} MB")
+    cols[2].metric("Swap", f"{latest['swap_mb']:.0f} MB")
+    cols[3].metric("Rows stored / exported", f"{latest.get('stored_total', 0)} / {latest.get('exported_total', 0)}")
+    frame = pd.DataFrame(samples)
+    frame["time"] = pd.to_datetime(frame["time"], unit="s")
+    frame = frame.set_index("time")
+    depths = [column for column in frame.columns if column.endswith("_depth")]
+    rates = [column for column in frame.columns if column.endswith("_per_second")]
+    st.caption("Queue depths")
+    st.line_chart(frame[depths])
+    if rates:
+        st.caption("Throughput per stage (items/s)")
+        st.line_chart(frame[rates])
+
+
+def resume_google_sheet(job, crawl_id, googlesheetInstance):
+    """Sheet of an unfinished crawl, with the spilled rows appended first so the export appends after them."""
+    crawl = journal.crawl(crawl_id)
+    writer = SheetWriter(
+        crawl["sheet_id"], googlesheetInstance, on_write=lambda rows: job.metrics.count("exported", len(rows))
+    )
+    writer.next_row = writer.first_free_row()
+    writer.drain_spill()
+    return crawl["sheet_id"], crawl["sheet_url"], writer.next_row
 
-def process_google_sheet(is_just_moyos, url1="", url2=""):
+
+def process_google_sheet(job, is_just_moyos, url1, url2, resume_crawl):
+    """Job function: prepare the sheet, then crawl into it. Runs on a job runner thread."""
+    # Services of this thread; the ones of the script thread must not be shared with it
+    googleDriveInstance = googleDriveConnect()
+    googlesheetInstance = googleSheetConnect()
     headers = {
         'values': ["url", "MVNO", "요금제명", "월 요금", "월 데이터", "일 데이터", "데이터 속도", "통화(분)", "문자(건)", "통신사", "망종류", "할인정보", "통신사 약정", "번호이동 수수료", "일반 유심 배송", "NFC 유심 배송", "eSim", "지원", "미지원", "이벤트", "카드 할인"]
     }
-    with st.spinner("Processing for Google Sheet..."):
-        sheet_id, webviewlink = create_new_google_sheet(is_just_moyos, url1, url2)
+    if resume_crawl:
+        crawl_id = resume_crawl
+        sheet_id, sheetUrl, start_row = resume_google_sheet(job, crawl_id, googlesheetInstance)
+        print("Resuming crawl into Google Sheet - Sheet ID: ", sheet_id)
+    else:
+        sheet_id, webviewlink = create_new_google_sheet(is_just_moyos, url1, url2, googleDriveInstance)
         print("Google Sheet Created - Sheet ID: ", sheet_id)
-        result, googlesheetInstance = pushToSheet(headers, sheet_id, 'Sheet1!A1:L1')
+        result, _ = pushToSheet(headers, sheet_id, 'Sheet1!A1:L1', googlesheetInstance)
         print("Header Pushed to Google Sheet: ", result)
         formatHeaderTrim(sheet_id, 0, googlesheetInstance)
         print("Header Formatted")
         sheetUrl = str(webviewlink)
-        st.link_button("Go to see", sheetUrl)
-
-        # Start the crawling process after formatting the header
+        start_row = 2
+        crawl_id = journal.start_crawl(
+            "just_moyos" if is_just_moyos else "range", sheet_id, sheetUrl, {"url1": url1, "url2": url2}
+        )
+    job.update(sheet_url=sheetUrl, crawl_id=crawl_id)
+
+    # The lease keeps the crawl out of "Resume last crawl" while this job runs it
+    with journal.lease(crawl_id):
         if is_just_moyos:
-            moyocrawling_Just_Moyos(sheet_id, sheetUrl, googlesheetInstance)
             print("Just Moyos Crawling Started/////////////////////////////////////////////////////////////////")
+            moyocrawling_Just_Moyos(job, sheet_id, sheetUrl, googlesheetInstance, crawl_id, bool(resume_crawl), start_row)
         else:
-            moyocrawling(url1, url2, sheet_id, googlesheetInstance)
             print("Crawling Started/////////////////////////////////////////////////////////////////")
+            moyocrawling(job, url1, url2, sheet_id, googlesheetInstance, crawl_id, bool(resume_crawl), start_row)
+
 
-        # Wait for the completion of the moyocrawling process
-        while not thread_completed.is_set():
-            if not error_queue.empty():
-                error_message = error_queue.get()
-                st.error(error_message)
-            time.sleep(0.1)
-
-    # If there are any remaining errors in the queue, display them
-    if not error_queue.empty():
-        while not error_queue.empty():
-            st.error(error_queue.get())
-
-    elif not log_queue.empty():
-        while not log_queue.empty():
-            st.info(log_queue.get())
+def render_job(job_id):
+    job = runner.get(job_id)
+    if job is None:
+        return
+    snapshot = job.snapshot()
+    progress = snapshot["progress"]
+    if progress.get("sheet_url"):
+        st.link_button("Go to see", progress["sheet_url"])
+    if progress.get("crawl_id"):
+        counts = journal.counts(progress["crawl_id"])
+        total = sum(counts.values())
+        stored = counts.get(WRITTEN, 0)
+        st.progress(stored / total if total else 0.0, text=f"{stored} / {total} plans stored")
+        exported = store.counts(progress["crawl_id"])["exported"]
+        st.progress(exported / total if total else 0.0, text=f"{exported} / {total} plans exported to the sheet")
+        if progress.get("crawl_finished") and job.active:
+            st.caption("Crawl finished, the sheet export is still catching up.")
+    render_metrics(job)
+
+    for error_message in snapshot["errors"]:
+        st.error(error_message)
+    if job.active:
+        st.caption(f"Job {job.job_id} is {job.status}...")
+    elif job.status == DONE:
+        for log_message in snapshot["logs"]:
+            st.info(log_message)
+        if not snapshot["errors"]:
+            st.success("Process Completed")
     else:
-        st.success("Process Completed")
+        st.warning(f"Job {job.job_id} {job.status}")
+
 
 if 'show_download_buttons' in st.session_state and st.session_state['show_download_buttons']:
     url1 = st.session_state.get('url1')
@@ -947,10 +948,68 @@ if 'show_download_buttons' in st.session_state and st.session_state['show_downlo
     if gs_button_pressed:
         try:
             print("Processing Google Sheet.../////////////////////////////////////////////////////////////////")
-            process_google_sheet(st.session_state['Just_Moyos'], url1, url2)
+            if st.session_state.get('resume_crawl'):
+                # Lease it now, the job may wait in the queue before it takes the lease itself
+                journal.heartbeat(st.session_state['resume_crawl'])
+            # Load the credentials on the script thread, the first load needs a Streamlit
+            # context; the job then only builds its own services from them
+            googleDriveConnect()
+            googleSheetConnect()
+            st.session_state['moyo_job'] = runner.submit(
+                "moyo",
+                process_google_sheet,
+                st.session_state['Just_Moyos'],
+                url1,
+                url2,
+                st.session_state.get('resume_crawl'),
+            )
         except Exception as e:
             st.error(f"An Error Occurred: {e}")
 
-    if stop_button_pressed:
-        stop_signal.set()  # Signal threads to stop
-        st.write("Stopped all processes...")
\ No newline at end of file
+    if stop_button_pressed and st.session_state.get('moyo_job'):
+        runner.cancel(st.session_state['moyo_job'])  # Signal this session's job to stop
+        st.write("Stopping the crawl...")
+
+def render_crawl_comparison():
+    crawls = store.crawls()
+    if not crawls:
+        return
+    kst = pytz.timezone('Asia/Seoul')
+    labels = {
+        crawl["crawl_id"]: f"{datetime.fromtimestamp(crawl['started'], kst):%Y-%m-%d %H:%M} ({crawl['plans']} plans)"
+        for crawl in crawls
+    }
+    crawl_ids = list(labels)
+    with st.expander("Compare crawls"):
+        new_crawl = st.selectbox("Newer crawl", crawl_ids, format_func=labels.get, index=0)
+        old_crawl = st.selectbox(
+            "Older crawl", crawl_ids, format_func=labels.get, index=min(1, len(crawl_ids) - 1)
+        )
+        if st.button("Compare", disabled=new_crawl == old_crawl):
+            added, removed, changes = store.diff(old_crawl, new_crawl)
+            st.write(f"{len(added)} plans added, {len(removed)} removed, {len(changes)} values changed")
+            if len(added):
+                st.caption("Added")
+                st.dataframe(added, hide_index=True)
+            if len(removed):
+                st.caption("Removed")
+                st.dataframe(removed, hide_index=True)
+            if len(changes):
+                st.caption("Changed")
+                st.dataframe(changes, hide_index=True)
+        if st.button("Export newer crawl as Parquet"):
+            st.download_button(
+                "Download Parquet",
+                store.to_parquet(new_crawl),
+                file_name=f"moyo_{labels[new_crawl].split(' (')[0].replace(' ', '_')}.parquet",
+            )
+
+
+if st.session_state.get('moyo_job'):
+    render_job(st.session_state['moyo_job'])
+    # Poll the runner: rerun while the job is active, the crawl itself never blocks this script
+    if runner.status(st.session_state['moyo_job']) in (QUEUED, RUNNING):
+        time.sleep(1)
+        st.rerun()
+
+render_crawl_comparison()
@@ -1,21 +1,18 @@
-from langchain.storage import LocalFileStore
 import streamlit as st
-import subprocess
-import math
-from pydub import AudioSegment
 import glob
-import openai
 import os
 from langchain.chat_models import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 from langchain.document_loaders import TextLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import StrOutputParser
-from langchain.vectorstores.faiss import FAISS
-from langchain.embeddings import CacheBackedEmbeddings, OpenAIEmbeddings
+from langchain.embeddings import OpenAIEmbeddings
+from audio_segments import segment_audio
+from index_cache import content_hash, load_or_build_index
+from transcription import get_backend, transcribe_files
 
-# Initialize OpenAI client
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Whisper API by default, TRANSCRIPTION_BACKEND=faster-whisper for a local model
+transcription_backend = get_backend()
 
 llm = ChatOpenAI(
     temperature=0.1,
@@ -31,20 +28,23 @@ splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
 def embed_file(file_path):
     st.write(f"Loading and embedding file from path: {file_path}")
     try:
-        cache_dir = LocalFileStore(f"./.cache/embeddings/{file_path}")
-        splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
-            chunk_size=800,
-            chunk_overlap=100,
-        )
-        loader = TextLoader(file_path)
-        docs = loader.load_and_split(text_splitter=splitter)
-        st.write(f"Number of documents loaded and split: {len(docs)}")
-        if len(docs) == 0:
+        with open(file_path, "rb") as f:
+            file_hash = content_hash(f.read())
+
+        def load_docs():
+            splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+                chunk_size=800,
+                chunk_overlap=100,
+            )
+            loader = TextLoader(file_path)
+            docs = loader.load_and_split(text_splitter=splitter)
+            st.write(f"Number of documents loaded and split: {len(docs)}")
+            return docs
+
+        vectorstore = load_or_build_index("meetings", file_hash, load_docs, OpenAIEmbeddings())
+        if vectorstore is None:
             st.write("No documents were loaded. Please check the file content.")
             return None
-        embeddings = OpenAIEmbeddings()
-        cached_embeddings = CacheBackedEmbeddings.from_bytes_store(embeddings, cache_dir)
-        vectorstore = FAISS.from_documents(docs, cached_embeddings)
         retriever = vectorstore.as_retriever()
         return retriever
     except Exception as e:
@@ -57,73 +57,39 @@ def transcribe_chunks(chunk_folder, destination):
         return
     st.write(f"Starting transcription of audio chunks from folder: {chunk_folder}")
     files = glob.glob(f"{chunk_folder}/*.mp3")
-    files.sort()
     st.write(f"Found {len(files)} audio chunks for transcription.")
-    for file in files:
-        try:
-            with open(file, "rb") as audio_file:
-                st.write(f"Transcribing file: {file}")
-                transcript = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                )
-                with open(destination, "a") as text_file:
-                    text_file.write(transcript.text)
-        except Exception as e:
-            st.write(f"Error transcribing file {file}: {e}")
+    if not files:
+        raise RuntimeError(f"No audio chunks found in {chunk_folder}, nothing to transcribe.")
+    progress = st.progress(0.0, text="Transcribing...")
+    failed = []
+
+    def on_progress(done, total, file, error):
+        if error:
+            failed.append(file)
+            st.write(f"Error transcribing file {file}: {error}")
+        progress.progress(done / total, text=f"Transcribed {done}/{total} chunks")
+
+    # Chunks are transcribed concurrently and come back in chunk order
+    texts = transcribe_files(files, transcription_backend, on_progress=on_progress)
+    if len(failed) == len(files):
+        # An empty transcript would be taken as done on the next run and never retried
+        raise RuntimeError(f"None of the {len(files)} audio chunks could be transcribed, no transcript was saved.")
+    with open(destination, "w") as text_file:
+        text_file.write(" ".join(text.strip() for text in texts if text))
     st.write(f"Transcription completed. Transcript saved at {destination}")
 
-def extract_audio_from_video(video_path):
+def extract_audio_chunks(video_path, audio_path, chunk_size, chunks_folder, silence_aware=True):
     if has_transcript:
         st.write("Transcript already exists.")
         return
-    audio_path = video_path.replace("mp4", "mp3")
-    command = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        video_path,
-        "-vn",
-        audio_path,
-    ]
     try:
-        st.write(f"Running command: {' '.join(command)}")
-        result = subprocess.run(command, capture_output=True, text=True)
-        if result.returncode != 0:
-            st.write(f"Error in ffmpeg: {result.stderr}")
-        else:
-            st.write(f"ffmpeg output: {result.stdout}")
+        # One ffmpeg encode straight from the video to upload-sized mono chunks, nothing is decoded into memory
+        chunks = segment_audio(video_path, audio_path, chunks_folder, chunk_size, silence_aware)
+        st.write(f"Audio cut into {len(chunks)} chunks, saved in {chunks_folder}")
     except FileNotFoundError as e:
         st.write(f"ffmpeg not found: {e}")
     except Exception as e:
-        st.write(f"Error running ffmpeg: {e}")
-    return audio_path
-
-def cut_audio_in_chunks(audio_path, chunk_size, chunks_folder):
-    if has_transcript:
-        st.write("Transcript already exists.")
-        return
-    st.write(f"Checking if audio file exists at {audio_path}")
-    if not os.path.exists(audio_path):
-        st.write(f"Audio file not found at {audio_path}")
-        return
-    st.write(f"Audio file found at {audio_path}")
-    try:
-        track = AudioSegment.from_mp3(audio_path)
-        chunk_len = chunk_size * 60 * 1000
-        chunks = math.ceil(len(track) / chunk_len)
-        os.makedirs(chunks_folder, exist_ok=True)
-        for i in range(chunks):
-            start_time = i * chunk_len
-            end_time = (i + 1) * chunk_len
-            chunk = track[start_time:end_time]
-            chunk.export(
-                f"./{chunks_folder}/chunk_{i}.mp3",
-                format="mp3",
-            )
-        st.write(f"Audio cut into {chunks} chunks, saved in {chunks_folder}")
-    except Exception as e:
-        st.write(f"Error cutting audio into chunks: {e}")
+        st.write(f"Error extracting audio chunks: {e}")
 
 st.set_page_config(
     page_title="MeetingAI",
@@ -145,21 +111,25 @@ with st.sidebar:
         "Video",
         type=["mp4", "avi", "mkv", "mov"],
     )
+    silence_aware = st.checkbox(
+        "Split at silences",
+        value=True,
+        help="Move each cut to the nearest pause, so no chunk starts or ends mid-word.",
+    )
 
 if video:
     chunks_folder = "./.cache/chunks"
     with st.status("Loading video...") as status:
         video_content = video.read()
         video_path = f"./.cache/{video.name}"
-        audio_path = video_path.replace("mp4", "mp3")
-        transcript_path = video_path.replace("mp4", "txt")
+        # splitext, not replace("mp4", ...): for .mkv / .mov uploads that gave back the video path itself
+        audio_path = os.path.splitext(video_path)[0] + ".mp3"
+        transcript_path = os.path.splitext(video_path)[0] + ".txt"
         os.makedirs(os.path.dirname(video_path), exist_ok=True)
         with open(video_path, "wb") as f:
             f.write(video_content)
-        status.update(label="Extracting audio...")
-        audio_path = extract_audio_from_video(video_path)
-        status.update(label="Cutting audio segments...")
-        cut_audio_in_chunks(audio_path, 10, chunks_folder)
+        status.update(label="Extracting audio segments...")
+        extract_audio_chunks(video_path, audio_path, 10, chunks_folder, silence_aware)
         status.update(label="Transcribing audio...")
         transcribe_chunks(chunks_folder, transcript_path)
 
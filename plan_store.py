@@ -0,0 +1,212 @@
+import io
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from moyo_extract import PlanRecord
+
+STORE_PATH = "./.cache/crawls/plans.sqlite"
+# Sheet column order: url, the PlanRecord fields, then the 서비스 status of range crawls
+COLUMNS = ["url"] + list(PlanRecord._fields) + ["status"]
+
+# Values of the `exported` column
+PENDING = 0
+EXPORTED = 1
+# Handed to a sheet push that has not settled yet
+CLAIMED = 2
+
+
+class PlanStore:
+    """
+    Local store of the crawled plan rows, written first and at disk speed. Rows are
+    kept per crawl with an export state (pending, claimed by a push in flight, or
+    exported), so the Sheets export can lag behind the crawl and two crawls can be
+    compared offline.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        columns = ", ".join(f"{column} TEXT" for column in COLUMNS)
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"CREATE TABLE IF NOT EXISTS plans ("
+                f"crawl_id TEXT, crawled_at REAL, exported INTEGER DEFAULT 0, {columns}, "
+                f"PRIMARY KEY (crawl_id, url))"
+            )
+
+    def add_rows(self, crawl_id, rows):
+        """Store sheet rows (url first); a url crawled again in the same crawl replaces its row."""
+        now = time.time()
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        values = [
+            (crawl_id, now, *(list(row) + [None] * len(COLUMNS))[:len(COLUMNS)])
+            for row in rows
+        ]
+        with self.lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO plans (crawl_id, crawled_at, {', '.join(COLUMNS)}) "
+                f"VALUES (?, ?, {placeholders})",
+                values,
+            )
+
+    def claim(self, crawl_id, limit=1000):
+        """
+        Claim the next pending rows for a push, as (rowid, sheet row) in the order they
+        were stored. They count as exported only once `mark_exported` confirms them.
+        """
+        with self.lock, self.conn:
+            rows = self.conn.execute(
+                f"SELECT rowid, {', '.join(COLUMNS)} FROM plans "
+                f"WHERE crawl_id = ? AND exported = ? ORDER BY rowid LIMIT ?",
+                (crawl_id, PENDING, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE plans SET exported = ? WHERE rowid = ?", [(CLAIMED, row[0]) for row in rows]
+            )
+        # Range crawls have a status column, Just Moyos crawls do not
+        return [(row[0], list(row[1:-1]) + ([row[-1]] if row[-1] is not None else [])) for row in rows]
+
+    def mark_exported(self, rowids):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "UPDATE plans SET exported = ? WHERE rowid = ?", [(EXPORTED, rowid) for rowid in rowids]
+            )
+
+    def release_claims(self, crawl_id, rowids=None):
+        """Make claimed rows pending again: all of the crawl's, or only `rowids`."""
+        with self.lock, self.conn:
+            if rowids is None:
+                self.conn.execute(
+                    "UPDATE plans SET exported = ? WHERE crawl_id = ? AND exported = ?",
+                    (PENDING, crawl_id, CLAIMED),
+                )
+            else:
+                self.conn.executemany(
+                    "UPDATE plans SET exported = ? WHERE rowid = ? AND exported = ?",
+                    [(PENDING, rowid, CLAIMED) for rowid in rowids],
+                )
+
+    def counts(self, crawl_id):
+        with self.lock:
+            stored, exported = self.conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(exported = ?), 0) FROM plans WHERE crawl_id = ?",
+                (EXPORTED, crawl_id),
+            ).fetchone()
+        return {"stored": stored, "exported": exported}
+
+    def crawls(self):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT crawl_id, MIN(crawled_at), COUNT(*) FROM plans GROUP BY crawl_id ORDER BY MIN(crawled_at) DESC"
+            ).fetchall()
+        return [{"crawl_id": crawl_id, "started": started, "plans": plans} for crawl_id, started, plans in rows]
+
+    def to_frame(self, crawl_id):
+        with self.lock:
+            return pd.read_sql_query(
+                f"SELECT {', '.join(COLUMNS)} FROM plans WHERE crawl_id = ? ORDER BY rowid",
+                self.conn,
+                params=(crawl_id,),
+            )
+
+    def to_parquet(self, crawl_id, path=None):
+        """Columnar copy of one crawl; returns the bytes when no path is given."""
+        frame = self.to_frame(crawl_id)
+        if path:
+            frame.to_parquet(path, index=False)
+            return path
+        buffer = io.BytesIO()
+        frame.to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    def diff(self, old_crawl_id, new_crawl_id):
+        """
+        Plans added and removed between two crawls, and every changed value of the
+        plans in both, as (url, column, old, new).
+        """
+        old = self.to_frame(old_crawl_id).set_index("url")
+        new = self.to_frame(new_crawl_id).set_index("url")
+        added = new.loc[new.index.difference(old.index)].reset_index()
+        removed = old.loc[old.index.difference(new.index)].reset_index()
+        common = old.index.intersection(new.index)
+        old_common = old.loc[common].fillna("")
+        new_common = new.loc[common, old.columns].fillna("")
+        changed = (
+            old_common.ne(new_common)
+            .stack()
+            .loc[lambda mask: mask]
+            .index
+        )
+        changes = pd.DataFrame(
+            [(url, column, old_common.at[url, column], new_common.at[url, column]) for url, column in changed],
+            columns=["url", "column", "old", "new"],
+        )
+        return added, removed, changes
+
+
+class SheetsExporter:
+    """
+    Copies the stored rows of one crawl to its sheet through a SheetWriter, in the
+    background. Up to `workers` batches are pushed concurrently, each to rows
+    reserved up front so the sheet keeps the store order. It follows the store
+    while the crawl runs and stops once the crawl is done (`crawl_done` is set)
+    and every row is exported, or when `stop` is set.
+
+    Rows are claimed while their push is in flight and marked exported only once it
+    has succeeded, so after a crash they are exported again instead of being lost.
+    The store is their durable queue: a batch that keeps failing is not spilled but
+    stays pending (`rows_failed`), keeping the crawl unfinished until a resumed run
+    exports it.
+    """
+
+    def __init__(self, store, crawl_id, writer, workers=3, poll_interval=2.0):
+        self.store = store
+        self.crawl_id = crawl_id
+        self.writer = writer
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.crawl_done = threading.Event()
+        self.rows_failed = 0
+
+    def settle(self, futures):
+        """Confirm the rows of successful pushes. Failed ones stay claimed until the run ends."""
+        for future in futures:
+            rowids = self.in_flight.pop(future)
+            if future.exception() is None and future.result():
+                self.store.mark_exported(rowids)
+            else:
+                self.rows_failed += len(rowids)
+
+    def run(self, stop=None):
+        self.writer.started = time.monotonic()
+        # Claims left over from a run that died mid-push were never confirmed
+        self.store.release_claims(self.crawl_id)
+        self.in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="export") as executor:
+            while not (stop is not None and stop.is_set()):
+                self.settle([future for future in self.in_flight if future.done()])
+                if len(self.in_flight) >= self.workers:
+                    wait(self.in_flight, return_when=FIRST_COMPLETED)
+                    continue
+                # Read the flag first, so rows stored right before it was set are still exported
+                crawl_done = self.crawl_done.is_set()
+                claimed = self.store.claim(self.crawl_id, limit=self.writer.max_rows)
+                if claimed:
+                    rows = [row for _, row in claimed]
+                    start_row = self.writer.reserve_rows(len(rows))
+                    future = executor.submit(self.writer.flush, rows, start_row, spill=False)
+                    self.in_flight[future] = [rowid for rowid, _ in claimed]
+                    continue
+                if crawl_done and not self.in_flight:
+                    break
+                time.sleep(self.poll_interval)
+            wait(self.in_flight)
+            self.settle(list(self.in_flight))
+        # Failed rows were kept claimed so this run would not retry them forever
+        self.store.release_claims(self.crawl_id)
@@ -0,0 +1,75 @@
+"""
+Make and store the quizzes of a document library ahead of time, so QuizAI serves
+them instantly. Documents whose quiz is already stored are skipped.
+
+    python precompute_quizzes.py library/
+    python precompute_quizzes.py notes.pdf slides.docx --workers 8
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from langchain.chat_models import ChatOpenAI
+from langchain.embeddings import OpenAIEmbeddings
+
+from quiz_builder import make_quiz, split_document
+from quiz_store import QuizStore, quiz_key
+
+EXTENSIONS = (".pdf", ".txt", ".docx")
+
+
+def collect(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, _, names in os.walk(path):
+                files += sorted(os.path.join(folder, name) for name in names if name.lower().endswith(EXTENSIONS))
+        else:
+            files.append(path)
+    return files
+
+
+def precompute(file_path, store, llm, embeddings, force=False):
+    docs = split_document(file_path)
+    if not docs:
+        return "empty"
+    key = quiz_key(docs)
+    if key in store and not force:
+        return "stored"
+    quiz = make_quiz(docs, llm, embeddings)
+    if not quiz["questions"]:
+        return "failed"
+    store.put(key, quiz, os.path.basename(file_path))
+    return f"{len(quiz['questions'])} questions"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="documents or folders of documents")
+    parser.add_argument("--workers", type=int, default=4, help="documents made concurrently")
+    parser.add_argument("--model", default="gpt-3.5-turbo-1106")
+    parser.add_argument("--force", action="store_true", help="make the quiz again even if one is stored")
+    args = parser.parse_args()
+
+    store = QuizStore()
+    llm = ChatOpenAI(temperature=0.1, model=args.model)
+    embeddings = OpenAIEmbeddings()
+    files = collect(args.paths)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(precompute, file_path, store, llm, embeddings, args.force): file_path
+            for file_path in files
+        }
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                result = f"error: {e}"
+            print(f"{futures[future]}: {result}")
+    print(f"{len(files)} documents in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+import math
+from typing import List
+
+import numpy as np
+from langchain.document_loaders import UnstructuredFileLoader
+from langchain.output_parsers.openai_functions import JsonOutputFunctionsParser
+from langchain.prompts import ChatPromptTemplate
+from langchain.pydantic_v1 import BaseModel, ValidationError, validator
+from langchain.text_splitter import CharacterTextSplitter
+from langchain_core.utils.function_calling import convert_to_openai_function
+
+# Part of the stored quiz keys: bump it whenever the prompt, the schema or the
+# sharding below changes, so quizzes made the old way are not served any more
+PROMPT_VERSION = "quiz-v2"
+QUIZ_SIZE = 10
+# Documents with more chunks than this go through the map-reduce builder
+MAP_REDUCE_MIN_CHUNKS = 12
+# Chunks per shard; with 600 token chunks a shard stays far below the context window
+SHARD_SIZE = 4
+# Upper bound on the concurrent calls of one quiz, so its time does not grow with the document
+MAX_SHARDS = 8
+SHARDS_MAX_CONCURRENCY = 8
+# Candidates asked for on top of the quiz size, to make up for the ones dropped as duplicates
+OVERSAMPLE = 1.5
+DUPLICATE_SIMILARITY = 0.9
+
+
+class Answer(BaseModel):
+    answer: str
+    correct: bool
+
+
+class Question(BaseModel):
+    question: str
+    answers: List[Answer]
+
+    @validator("answers")
+    def one_correct_answer(cls, answers):
+        if len(answers) != 4 or sum(answer.correct for answer in answers) != 1:
+            raise ValueError("a question needs 4 answers with exactly one correct")
+        return answers
+
+
+class Quiz(BaseModel):
+    """Multiple choice questions about the context, each with 4 answers of which one is correct."""
+
+    questions: List[Question]
+
+
+quiz_prompt = ChatPromptTemplate.from_messages(
+    [
+        (
+            "system",
+            """
+    You are a helpful assistant that is role playing as a teacher.
+
+    Based ONLY on the following context make {count} questions to test the user's knowledge about the text.
+
+    Each question should have 4 answers, three of them must be incorrect and one should be correct.
+
+    Context: {context}
+""",
+        )
+    ]
+)
+
+quiz_function = convert_to_openai_function(Quiz)
+
+
+def split_document(file_path):
+    """The chunks quizzes are made from. The store keys on them, so the page and the CLI share this."""
+    splitter = CharacterTextSplitter.from_tiktoken_encoder(
+        separator="\n",
+        chunk_size=600,
+        chunk_overlap=100,
+    )
+    loader = UnstructuredFileLoader(file_path)
+    return loader.load_and_split(text_splitter=splitter)
+
+
+def format_docs(docs):
+    return "\n\n".join(document.page_content for document in docs)
+
+
+def make_quiz_chain(llm, count=QUIZ_SIZE):
+    """
+    Documents in, quiz dict out. The questions come back as function call arguments
+    that match the Quiz schema, so there is no free text to clean up before parsing.
+    """
+    return (
+        {"context": format_docs, "count": lambda _: count}
+        | quiz_prompt
+        | llm.bind(functions=[quiz_function], function_call={"name": quiz_function["name"]})
+        | JsonOutputFunctionsParser()
+    )
+
+
+def validate_question(question):
+    try:
+        return Question.parse_obj(question).dict()
+    except ValidationError:
+        return None
+
+
+def shard_documents(docs, shard_size=SHARD_SIZE, max_shards=MAX_SHARDS):
+    """
+    Consecutive groups of `shard_size` chunks. A longer document is sampled down to
+    `max_shards` groups spread evenly from its start to its end.
+    """
+    shards = [docs[start:start + shard_size] for start in range(0, len(docs), shard_size)]
+    if len(shards) <= max_shards:
+        return shards
+    step = len(shards) / max_shards
+    return [shards[int(index * step)] for index in range(max_shards)]
+
+
+def dedupe_questions(questions, embeddings, threshold=DUPLICATE_SIMILARITY):
+    """Drop every question whose embedding is within `threshold` cosine similarity of an earlier one."""
+    if len(questions) < 2:
+        return questions
+    vectors = np.array(embeddings.embed_documents([question["question"] for question in questions]), dtype=float)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    kept = []
+    for index in range(len(questions)):
+        if all(vectors[index] @ vectors[other] < threshold for other in kept):
+            kept.append(index)
+    return [questions[index] for index in kept]
+
+
+def interleave(groups):
+    """Round robin over the groups, so a cut of the result still covers all of them."""
+    merged = []
+    for index in range(max((len(group) for group in groups), default=0)):
+        merged.extend(group[index] for group in groups if index < len(group))
+    return merged
+
+
+def build_quiz(
+    docs,
+    llm,
+    embeddings,
+    size=QUIZ_SIZE,
+    shard_size=SHARD_SIZE,
+    max_shards=MAX_SHARDS,
+    max_concurrency=SHARDS_MAX_CONCURRENCY,
+):
+    """
+    Map-reduce quiz for documents too large for one context: a few candidate
+    questions per shard, generated in one concurrent batch, then near-duplicates
+    removed and the quiz cut to at most `size`. Shards that fail are skipped.
+    """
+    shards = shard_documents(docs, shard_size, max_shards)
+    if not shards:
+        return {"questions": []}
+    per_shard = max(2, math.ceil(size * OVERSAMPLE / len(shards)))
+    results = make_quiz_chain(llm, per_shard).batch(
+        shards,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    )
+    candidates = [
+        [question for question in map(validate_question, result.get("questions", [])) if question]
+        for result in results
+        if isinstance(result, dict)
+    ]
+    questions = dedupe_questions(interleave(candidates), embeddings)
+    return {"questions": questions[:size]}
+
+
+def fill_quiz(questions, docs, llm, size=QUIZ_SIZE):
+    """
+    Ask once more for the questions missing from a quiz, e.g. the ones dropped as
+    invalid or duplicates, and return the quiz with them added. It may still be
+    short if the call fails or its questions are not usable either. Long documents
+    are sampled down to two shards for the call.
+    """
+    missing = size - len(questions)
+    if missing <= 0:
+        return questions[:size]
+    context = docs if len(docs) <= MAP_REDUCE_MIN_CHUNKS else sum(shard_documents(docs, max_shards=2), [])
+    try:
+        result = make_quiz_chain(llm, missing).invoke(context)
+    except Exception:
+        return questions
+    asked = {question["question"].strip().lower() for question in questions}
+    added = []
+    for question in map(validate_question, result.get("questions", [])):
+        if question and question["question"].strip().lower() not in asked:
+            asked.add(question["question"].strip().lower())
+            added.append(question)
+    return questions + added[:missing]
+
+
+def make_quiz(docs, llm, embeddings):
+    """
+    One single-pass call for short documents, the map-reduce builder for long ones,
+    then one more call for the questions that were dropped (see `fill_quiz`).
+    """
+    if len(docs) > MAP_REDUCE_MIN_CHUNKS:
+        questions = build_quiz(docs, llm, embeddings)["questions"]
+    else:
+        result = make_quiz_chain(llm).invoke(docs)
+        questions = [question for question in map(validate_question, result.get("questions", [])) if question]
+    if questions:
+        questions = fill_quiz(questions, docs, llm)
+    return {"questions": questions}
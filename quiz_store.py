@@ -0,0 +1,62 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from quiz_builder import PROMPT_VERSION
+
+STORE_PATH = "./.cache/quizzes/quizzes.sqlite"
+
+
+def quiz_key(docs, prompt_version=PROMPT_VERSION):
+    """
+    Hash of the chunk contents and the prompt version. Two files with the same name
+    get different quizzes, and the same text uploaded under any name gets the same one.
+    """
+    digest = hashlib.sha256(prompt_version.encode())
+    for document in docs:
+        digest.update(b"\0")
+        digest.update(document.page_content.encode())
+    return digest.hexdigest()
+
+
+class QuizStore:
+    """Finished quizzes on disk, so they survive restarts and can be made ahead of time."""
+
+    def __init__(self, path=STORE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS quizzes ("
+                "key TEXT PRIMARY KEY, prompt_version TEXT, source TEXT, created REAL, quiz TEXT)"
+            )
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT quiz FROM quizzes WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key, quiz, source=None, prompt_version=PROMPT_VERSION):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO quizzes (key, prompt_version, source, created, quiz) VALUES (?, ?, ?, ?, ?)",
+                (key, prompt_version, source, time.time(), json.dumps(quiz, ensure_ascii=False)),
+            )
+
+    def __contains__(self, key):
+        with self.lock:
+            return self.conn.execute("SELECT 1 FROM quizzes WHERE key = ?", (key,)).fetchone() is not None
+
+    def get_or_make(self, docs, make, source=None, prompt_version=PROMPT_VERSION):
+        """The stored quiz of `docs`, or a new one from `make(docs)`; empty quizzes are not stored."""
+        key = quiz_key(docs, prompt_version)
+        quiz = self.get(key)
+        if quiz is None:
+            quiz = make(docs)
+            if quiz["questions"]:
+                self.put(key, quiz, source, prompt_version)
+        return quiz
@@ -0,0 +1,277 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import google_auth_httplib2
+import httplib2
+from googleapiclient.errors import HttpError
+from ratelimit import limits, sleep_and_retry
+
+PER_MINUTE_LIMIT = 60
+SPILL_PATH = "./.cache/sheets/spill.sqlite"
+QUOTA_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "RESOURCE_EXHAUSTED", "Quota exceeded")
+
+
+_local = threading.local()
+
+
+def authorized_http(credentials, timeout=60):
+    """
+    One authorized transport per thread and credentials. httplib2.Http is not
+    thread-safe, so requests of a shared service are executed with this instead
+    of the service's own transport; the credentials themselves are shared.
+    """
+    transports = getattr(_local, "transports", None)
+    if transports is None:
+        transports = _local.transports = {}
+    http = transports.get(id(credentials))
+    if http is None:
+        http = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=timeout))
+        transports[id(credentials)] = http
+    return http
+
+
+@sleep_and_retry
+@limits(calls=PER_MINUTE_LIMIT, period=60)
+def rate_limited_execute(request):
+    credentials = getattr(getattr(request, "http", None), "credentials", None)
+    if credentials is None:
+        return request.execute()
+    return request.execute(http=authorized_http(credentials))
+
+
+def is_quota_error(error):
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 429:
+        return True
+    return error.resp.status == 403 and any(reason in str(error) for reason in QUOTA_REASONS)
+
+
+def retry_after(error):
+    """Seconds asked for by a Retry-After header, if the error carries one."""
+    if not isinstance(error, HttpError):
+        return None
+    value = error.resp.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class QuotaScheduler:
+    """
+    Shared by every writer of the process. Delays follow capped exponential backoff
+    with full jitter, and a quota error pauses all writers until the quota window
+    has passed instead of letting each of them keep hitting the API.
+    """
+
+    def __init__(self, base_delay=1.0, max_delay=64.0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            delay = self.blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def backoff(self, attempt, error):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, requested)
+        if is_quota_error(error):
+            with self.lock:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+        return delay
+
+
+quota_scheduler = QuotaScheduler()
+
+
+class SpillQueue:
+    """Batches that kept failing, kept on disk with their reserved row offset."""
+
+    def __init__(self, path=SPILL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS spill ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, sheet_id TEXT, start_row INTEGER, rows TEXT)"
+            )
+
+    def put(self, sheet_id, start_row, rows):
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO spill (sheet_id, start_row, rows) VALUES (?, ?, ?)",
+                (sheet_id, start_row, json.dumps(rows, ensure_ascii=False)),
+            )
+
+    def pending(self, sheet_id):
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, start_row, rows FROM spill WHERE sheet_id = ? ORDER BY id", (sheet_id,)
+            ).fetchall()
+        return [(spill_id, start_row, json.loads(data)) for spill_id, start_row, data in rows]
+
+    def remove(self, spill_id):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM spill WHERE id = ?", (spill_id,))
+
+
+class SheetWriter:
+    """
+    Writes batches of rows with values.batchUpdate at explicit row offsets, at most
+    `max_rows` rows per batch (the plan store's SheetsExporter claims them in that
+    size). Flushes can run on several threads at once, each with its own transport
+    (authorized_http).
+    """
+
+    def __init__(self, sheet_id, serviceInstance, sheet_name="Sheet1", start_row=2,
+                 max_rows=1000, max_attempts=6, scheduler=None, spill=None, on_write=None):
+        self.sheet_id = sheet_id
+        self.serviceInstance = serviceInstance
+        self.sheet_name = sheet_name
+        self.next_row = start_row
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self.scheduler = scheduler if scheduler else quota_scheduler
+        self.spill = spill if spill else SpillQueue()
+        self.on_write = on_write
+        self.grid_rows = None
+        self.offset_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.rows_written = 0
+        self.requests_made = 0
+        self.rows_spilled = 0
+        self.started = None
+
+    @property
+    def rows_per_second(self):
+        if not self.started:
+            return 0.0
+        return self.rows_written / max(time.monotonic() - self.started, 1e-6)
+
+    def reserve_rows(self, count):
+        """Hand out the next `count` rows of the sheet, so concurrent flushes never overlap."""
+        with self.offset_lock:
+            start = self.next_row
+            self.next_row += count
+            return start
+
+    def first_free_row(self):
+        """Row after the last filled cell of column A, for appending to an existing sheet."""
+        result = rate_limited_execute(
+            self.serviceInstance.spreadsheets().values().get(
+                spreadsheetId=self.sheet_id, range=f"{self.sheet_name}!A:A"
+            )
+        )
+        return len(result.get("values", [])) + 1
+
+    def _ensure_grid(self, last_row):
+        # values.batchUpdate does not grow the sheet like append does
+        if self.grid_rows is None:
+            metadata = rate_limited_execute(
+                self.serviceInstance.spreadsheets().get(spreadsheetId=self.sheet_id)
+            )
+            sheet = next(
+                s for s in metadata["sheets"] if s["properties"]["title"] == self.sheet_name
+            )
+            self.sheet_gid = sheet["properties"]["sheetId"]
+            self.grid_rows = sheet["properties"]["gridProperties"]["rowCount"]
+        if last_row <= self.grid_rows:
+            return
+        extra = max(last_row - self.grid_rows, 1000)
+        rate_limited_execute(
+            self.serviceInstance.spreadsheets().batchUpdate(
+                spreadsheetId=self.sheet_id,
+                body={
+                    "requests": [
+                        {
+                            "appendDimension": {
+                                "sheetId": self.sheet_gid,
+                                "dimension": "ROWS",
+                                "length": extra,
+                            }
+                        }
+                    ]
+                },
+            )
+        )
+        self.grid_rows += extra
+
+    def push(self, rows, start_row):
+        with self.offset_lock:
+            self._ensure_grid(start_row + len(rows) - 1)
+        body = {
+            "valueInputOption": "USER_ENTERED",
+            "data": [{"range": f"{self.sheet_name}!A{start_row}", "values": rows}],
+        }
+        result = rate_limited_execute(
+            self.serviceInstance.spreadsheets().values().batchUpdate(
+                spreadsheetId=self.sheet_id, body=body
+            )
+        )
+        with self.stats_lock:
+            self.requests_made += 1
+        return result
+
+    def flush(self, rows, start_row=None, spill=True):
+        """
+        Push one batch with backoff. After `max_attempts` failures the batch goes to
+        the spill queue (unless `spill` is false, for callers that keep the rows
+        themselves) so the writer can keep up with the crawl; returns False then.
+        """
+        if not rows:
+            return True
+        if start_row is None:
+            start_row = self.reserve_rows(len(rows))
+        for attempt in range(self.max_attempts):
+            self.scheduler.wait()
+            try:
+                self.push(rows, start_row)
+            except Exception as e:
+                delay = self.scheduler.backoff(attempt, e)
+                print(f"Failed to push data to sheet (attempt {attempt + 1}): {e}. Retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+            with self.stats_lock:
+                self.rows_written += len(rows)
+            if self.on_write:
+                self.on_write(rows)
+            print(
+                f"Wrote {len(rows)} rows at row {start_row} "
+                f"({self.rows_per_second:.1f} rows/s, {self.requests_made} requests)"
+            )
+            return True
+        if not spill:
+            print(f"Giving up on {len(rows)} rows for row {start_row}")
+            return False
+        self.spill.put(self.sheet_id, start_row, rows)
+        with self.stats_lock:
+            self.rows_spilled += len(rows)
+        print(f"Spilled {len(rows)} rows for row {start_row} to {self.spill.path}")
+        return False
+
+    def drain_spill(self):
+        """
+        Retry spilled batches of this sheet; returns the number of rows still spilled.
+        They are appended at the next free rows: the rows reserved for them may have
+        been filled or moved by a sort since.
+        """
+        remaining = 0
+        for spill_id, _, rows in self.spill.pending(self.sheet_id):
+            self.spill.remove(spill_id)
+            self.rows_spilled -= len(rows)
+            if not self.flush(rows):
+                remaining += len(rows)
+        return remaining
@@ -0,0 +1,464 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+from urllib.parse import urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain.embeddings import OpenAIEmbeddings
+from langchain.schema import BaseRetriever, Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.vectorstores.faiss import FAISS
+
+from html_text import html_to_text
+from index_cache import content_hash, has_index, index_path, load_index, save_index
+
+HTTP_CACHE_DIR = "./.cache/http"
+HEADERS = {"User-Agent": "Mozilla/5.0 (compatible; QUUSai-CrawlingAI)"}
+
+logger = logging.getLogger(__name__)
+
+
+def parse_page(html):
+    return html_to_text(html, strip=("header", "footer")).replace("CloseSearch Submit Blog", "")
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class HostRateLimiter:
+    """One token bucket per host, so a sitemap spanning several hosts is polite to each."""
+
+    def __init__(self, requests_per_second):
+        self.requests_per_second = requests_per_second
+        self.buckets = {}
+
+    async def acquire(self, url):
+        host = urlparse(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.requests_per_second)
+        await self.buckets[host].acquire()
+
+
+class ValidatorCache:
+    """Keeps ETag / Last-Modified and the last body per URL for conditional requests."""
+
+    def __init__(self, cache_dir=HTTP_CACHE_DIR):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode()).hexdigest() + ".json")
+
+    def get(self, url):
+        try:
+            with open(self._path(url), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def headers(self, url):
+        entry = self.get(url)
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def put(self, url, response_headers, body):
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        entry = {"etag": etag, "last_modified": last_modified, "body": body}
+        with open(self._path(url), "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+
+
+class SitemapCrawler:
+    def __init__(self, parsing_function, requests_per_second=2, concurrency=8, timeout=30):
+        self.parsing_function = parsing_function
+        self.requests_per_second = requests_per_second
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.validators = ValidatorCache()
+        self.total = 0
+        self.fetched = 0
+        self.not_modified = 0
+        self.failed = 0
+
+    async def _get(self, session, limiter, url, conditional=True):
+        await limiter.acquire(url)
+        headers = self.validators.headers(url) if conditional else {}
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304 and conditional:
+                entry = self.validators.get(url)
+                if entry and entry.get("body") is not None:
+                    self.not_modified += 1
+                    return entry["body"]
+            else:
+                response.raise_for_status()
+                body = await response.text()
+                self.validators.put(url, response.headers, body)
+                return body
+        # Not modified, but the cached body is gone (cache cleared or unreadable): fetch it in full
+        return await self._get(session, limiter, url, conditional=False)
+
+    async def fetch_entries(self, session, limiter, sitemap_url):
+        """Return the <url> entries of a sitemap, following nested sitemap indexes."""
+        soup = BeautifulSoup(await self._get(session, limiter, sitemap_url), "xml")
+        entries = []
+        for sitemap in soup.find_all("sitemap"):
+            loc = sitemap.find("loc")
+            if loc:
+                entries.extend(await self.fetch_entries(session, limiter, loc.text.strip()))
+        for url in soup.find_all("url"):
+            loc = url.find("loc")
+            if not loc:
+                continue
+            lastmod = url.find("lastmod")
+            entries.append(
+                {
+                    "loc": loc.text.strip(),
+                    "lastmod": lastmod.text.strip() if lastmod else "",
+                }
+            )
+        return entries
+
+    async def crawl(self, sitemap_url, select=None):
+        """
+        Yield one parsed Document per sitemap page, in the order the fetches finish.
+        `select(entries)` may narrow the sitemap down to the pages worth fetching.
+        """
+        limiter = HostRateLimiter(self.requests_per_second)
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=HEADERS) as session:
+            entries = await self.fetch_entries(session, limiter, sitemap_url)
+            if select:
+                entries = select(entries)
+            self.total = len(entries)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def fetch_entry(entry):
+                async with semaphore:
+                    try:
+                        return entry, await self._get(session, limiter, entry["loc"])
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        logger.warning("Failed to fetch %s: %s", entry["loc"], e)
+                        self.failed += 1
+                        return entry, None
+
+            for task in asyncio.as_completed([fetch_entry(entry) for entry in entries]):
+                entry, html = await task
+                if html is None:
+                    continue
+                try:
+                    page_content = self.parsing_function(html)
+                except Exception as e:
+                    # One unparsable page must not end the crawl of the others
+                    logger.warning("Failed to parse %s: %s", entry["loc"], e)
+                    self.failed += 1
+                    continue
+                self.fetched += 1
+                yield Document(
+                    page_content=page_content,
+                    metadata={"source": entry["loc"], "lastmod": entry["lastmod"]},
+                )
+
+
+class StreamingRetriever(BaseRetriever):
+    index: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.index.similarity_search(query, k=self.k)
+
+
+class SitemapState:
+    """Per-URL lastmod, content hash and chunk ids of the pages in a saved index."""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS pages ("
+                "url TEXT PRIMARY KEY, lastmod TEXT, content_hash TEXT, chunk_ids TEXT)"
+            )
+
+    def pages(self):
+        rows = self.conn.execute("SELECT url, lastmod, content_hash, chunk_ids FROM pages")
+        return {
+            url: {"lastmod": lastmod, "content_hash": page_hash, "chunk_ids": json.loads(chunk_ids)}
+            for url, lastmod, page_hash, chunk_ids in rows
+        }
+
+    def apply(self, upserts, deletes):
+        with self.conn:
+            self.conn.executemany("DELETE FROM pages WHERE url = ?", [(url,) for url in deletes])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?)",
+                [
+                    (url, page["lastmod"], page["content_hash"], json.dumps(page["chunk_ids"]))
+                    for url, page in upserts.items()
+                ],
+            )
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM pages")
+
+
+class StreamingSitemapIndex:
+    """
+    Crawls a sitemap on a background thread and embeds pages in batches as they
+    arrive, so the retriever answers from the pages indexed so far while the
+    crawl is still running.
+
+    The index is saved under .cache/indexes/sitemaps with a SQLite file of
+    per-URL state next to it. A refresh only fetches pages that are new or whose
+    lastmod changed, re-embeds the ones whose text actually changed and deletes
+    the vectors of pages that left the sitemap. The chunks of a whole batch of
+    pages are embedded in one call.
+    """
+
+    def __init__(self, sitemap_url, crawler, splitter, embeddings, batch_size=20, save_every=10):
+        self.sitemap_url = sitemap_url
+        self.crawler = crawler
+        self.splitter = splitter
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.save_every = save_every
+        self.index_dir = index_path("sitemaps", content_hash(sitemap_url.encode()))
+        self.state = SitemapState(f"{self.index_dir}.sqlite")
+        self.vector_store = None
+        self.pages = {}
+        self.pending_upserts = {}
+        self.pending_deletes = set()
+        self.error = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.done = threading.Event()
+        self.thread = None
+        if has_index(self.index_dir):
+            self.vector_store = load_index(self.index_dir, embeddings)
+            self.pages = self.state.pages()
+            self._reconcile()
+            self.ready.set()
+        else:
+            self.state.clear()
+
+    @property
+    def indexed(self):
+        return len(self.pages)
+
+    def start(self):
+        return self.refresh()
+
+    def refresh(self):
+        if self.thread and self.thread.is_alive():
+            return self
+        self.error = None
+        self.done.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def _run(self):
+        try:
+            asyncio.run(self._consume())
+        except Exception as e:
+            logger.exception("Crawl of %s failed", self.sitemap_url)
+            self.error = e
+        finally:
+            self.save()
+            self.done.set()
+            self.ready.set()
+
+    async def _consume(self):
+        batch = []
+        batches = 0
+        async for doc in self.crawler.crawl(self.sitemap_url, select=self.select_changed):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                await asyncio.to_thread(self.add_documents, batch)
+                batch = []
+                batches += 1
+                if batches % self.save_every == 0:
+                    await asyncio.to_thread(self.save)
+        if batch:
+            await asyncio.to_thread(self.add_documents, batch)
+
+    def _reconcile(self):
+        """
+        Match the state to the loaded index. A crash between `save_index` and
+        `state.apply` leaves the state describing chunks the index no longer has and
+        the index holding chunks no page owns; pages of the first kind are refetched
+        and the second kind is deleted.
+        """
+        stored = set(self.vector_store.index_to_docstore_id.values())
+        owned = set()
+        for url, page in list(self.pages.items()):
+            if all(chunk_id in stored for chunk_id in page["chunk_ids"]):
+                owned.update(page["chunk_ids"])
+            else:
+                del self.pages[url]
+                self.pending_deletes.add(url)
+        orphans = stored - owned
+        if orphans:
+            self.vector_store.delete(list(orphans))
+        if orphans or self.pending_deletes:
+            logger.info(
+                "Index of %s: %d pages to refetch, %d stray chunks", self.sitemap_url, len(self.pending_deletes), len(orphans)
+            )
+            save_index(self.vector_store, self.index_dir)
+            self.state.apply({}, self.pending_deletes)
+            self.pending_deletes = set()
+
+    def _delete_chunks(self, chunk_ids):
+        # Only ids the index still has, FAISS refuses the whole delete otherwise
+        stored = set(self.vector_store.index_to_docstore_id.values()) if self.vector_store else set()
+        chunk_ids = [chunk_id for chunk_id in chunk_ids if chunk_id in stored]
+        if chunk_ids:
+            self.vector_store.delete(chunk_ids)
+
+    def select_changed(self, entries):
+        """Drop pages that left the sitemap and keep only new or modified entries."""
+        if not entries:
+            # An empty or unreadable sitemap says nothing about which pages are gone
+            logger.warning("No pages in %s, keeping the %d indexed pages", self.sitemap_url, len(self.pages))
+            return []
+        current = set(entry["loc"] for entry in entries)
+        self.remove_pages([url for url in self.pages if url not in current])
+        changed = []
+        for entry in entries:
+            page = self.pages.get(entry["loc"])
+            # Pages without a lastmod are refetched, the conditional GET keeps that cheap
+            if page is None or not entry["lastmod"] or entry["lastmod"] != page["lastmod"]:
+                changed.append(entry)
+        logger.info("%d of %d sitemap pages are new or changed", len(changed), len(entries))
+        return changed
+
+    def remove_pages(self, urls):
+        with self.lock:
+            for url in urls:
+                page = self.pages.pop(url, None)
+                if page:
+                    self._delete_chunks(page["chunk_ids"])
+                self.pending_upserts.pop(url, None)
+                self.pending_deletes.add(url)
+
+    def add_documents(self, docs):
+        changed = []
+        for doc in docs:
+            url = doc.metadata["source"]
+            page_hash = content_hash(doc.page_content.encode())
+            page = self.pages.get(url)
+            if page and page["content_hash"] == page_hash:
+                # Only the lastmod moved, the vectors are still valid
+                page = dict(page, lastmod=doc.metadata["lastmod"])
+                with self.lock:
+                    self.pages[url] = self.pending_upserts[url] = page
+                continue
+            changed.append((doc, page_hash, self.splitter.split_documents([doc])))
+        if not changed:
+            return
+        texts = [chunk.page_content for _, _, chunks in changed for chunk in chunks]
+        # One call for the whole batch, embedded outside the lock so queries are
+        # never blocked on the OpenAI call
+        vectors = iter(self.embeddings.embed_documents(texts) if texts else [])
+        for doc, page_hash, chunks in changed:
+            self._upsert_page(doc, page_hash, chunks, [next(vectors) for _ in chunks])
+        self.ready.set()
+
+    def _upsert_page(self, doc, page_hash, chunks, vectors):
+        url = doc.metadata["source"]
+        url_key = content_hash(url.encode())[:16]
+        ids = [f"{url_key}-{page_hash[:8]}-{i}" for i in range(len(chunks))]
+        text_embeddings = list(zip([chunk.page_content for chunk in chunks], vectors))
+        metadatas = [chunk.metadata for chunk in chunks]
+        with self.lock:
+            old = self.pages.get(url)
+            if old:
+                self._delete_chunks(old["chunk_ids"])
+            if text_embeddings:
+                if self.vector_store is None:
+                    self.vector_store = FAISS.from_embeddings(
+                        text_embeddings, self.embeddings, metadatas, ids=ids
+                    )
+                else:
+                    self.vector_store.add_embeddings(text_embeddings, metadatas, ids=ids)
+            page = {"lastmod": doc.metadata["lastmod"], "content_hash": page_hash, "chunk_ids": ids}
+            self.pages[url] = self.pending_upserts[url] = page
+            self.pending_deletes.discard(url)
+
+    def save(self):
+        # The SQLite state is only written after the index, so it never
+        # describes vectors that were not persisted.
+        with self.lock:
+            if self.vector_store is None or not (self.pending_upserts or self.pending_deletes):
+                return
+            save_index(self.vector_store, self.index_dir)
+            self.state.apply(self.pending_upserts, self.pending_deletes)
+            self.pending_upserts = {}
+            self.pending_deletes = set()
+
+    def similarity_search(self, query, k=4):
+        embedding = self.embeddings.embed_query(query)
+        with self.lock:
+            if self.vector_store is None:
+                return []
+            return self.vector_store.similarity_search_by_vector(embedding, k=k)
+
+    def as_retriever(self, k=4):
+        return StreamingRetriever(index=self, k=k)
+
+
+if __name__ == "__main__":
+    # Incremental refresh from the command line, e.g. from a nightly cron job
+    parser = argparse.ArgumentParser(description="Crawl a sitemap and update its saved index.")
+    parser.add_argument("sitemap_url")
+    parser.add_argument("--requests-per-second", type=float, default=2)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    splitter = RecursiveCharacterTextSplitter.from_tiktoken_encoder(
+        chunk_size=1000,
+        chunk_overlap=200,
+    )
+    crawler = SitemapCrawler(parse_page, requests_per_second=args.requests_per_second)
+    index = StreamingSitemapIndex(args.sitemap_url, crawler, splitter, OpenAIEmbeddings())
+    index.refresh().done.wait()
+    if index.error:
+        raise SystemExit(f"Refresh failed: {index.error}")
+    print(
+        f"{index.indexed} pages indexed, {crawler.fetched} fetched, "
+        f"{crawler.not_modified} not modified, {crawler.failed} failed"
+    )
@@ -0,0 +1,65 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from crawl_journal import ABANDONED, FAILED, WRITTEN, CrawlJournal
+
+
+class CrawlJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.folder.name, "journal.sqlite")
+        self.journal = CrawlJournal(self.path, max_attempts=2)
+        self.crawl_id = self.journal.start_crawl("moyos", "sheet", "url")
+        self.journal.add_urls(self.crawl_id, ["a", "b"])
+
+    def tearDown(self):
+        self.journal.conn.close()
+        self.folder.cleanup()
+
+    def test_failing_url_is_abandoned(self):
+        self.journal.mark(self.crawl_id, ["a"], WRITTEN)
+        self.journal.mark(self.crawl_id, ["b"], FAILED, "timeout")
+        self.assertEqual(self.journal.unfinished(self.crawl_id), ["b"])
+        self.assertFalse(self.journal.finish(self.crawl_id))
+        self.journal.mark(self.crawl_id, ["b"], FAILED, "timeout")
+        self.assertEqual(self.journal.counts(self.crawl_id), {WRITTEN: 1, ABANDONED: 1})
+        self.assertEqual(self.journal.unfinished(self.crawl_id), [])
+        self.assertTrue(self.journal.finish(self.crawl_id))
+
+    def test_leased_crawl_is_not_offered_for_resuming(self):
+        self.assertIsNone(self.journal.latest_unfinished())
+        self.journal.release(self.crawl_id)
+        self.assertEqual(self.journal.latest_unfinished()["crawl_id"], self.crawl_id)
+        self.assertIsNone(self.journal.latest_unfinished(exclude=[self.crawl_id]))
+        with self.journal.lease(self.crawl_id, interval=0.01):
+            self.assertIsNone(self.journal.latest_unfinished())
+        self.assertEqual(self.journal.latest_unfinished()["crawl_id"], self.crawl_id)
+
+    def test_migrates_old_journals(self):
+        path = os.path.join(self.folder.name, "old.sqlite")
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE urls (crawl_id TEXT, url TEXT, state TEXT, updated REAL, error TEXT, "
+            "PRIMARY KEY (crawl_id, url))"
+        )
+        conn.execute("INSERT INTO urls VALUES ('old', 'a', 'failed', 0, NULL)")
+        conn.execute(
+            "CREATE TABLE crawls (crawl_id TEXT PRIMARY KEY, kind TEXT, sheet_id TEXT, sheet_url TEXT, "
+            "params TEXT, created REAL, done INTEGER DEFAULT 0)"
+        )
+        conn.execute("INSERT INTO crawls VALUES ('old', 'moyos', 'sheet', 'url', '{}', 0, 0)")
+        conn.commit()
+        conn.close()
+        journal = CrawlJournal(path, max_attempts=2)
+        self.assertEqual(journal.latest_unfinished()["crawl_id"], "old")
+        journal.mark("old", ["a"], FAILED)
+        self.assertEqual(journal.counts("old"), {FAILED: 1})
+        journal.mark("old", ["a"], FAILED)
+        self.assertEqual(journal.counts("old"), {ABANDONED: 1})
+        journal.conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import unittest
+
+from requests.models import Response
+
+from html_text import WHITESPACE, bs4_text, lxml_text
+from moyo_extract import regex_extract
+from moyo_extract import NOT_PROVIDED
+from moyo_fetch import EXPAND_ONLY_FIELDS, is_complete, response_text
+from moyo_parse import parse_plan_html
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def load(name):
+    # Served as UTF-8 without a <meta charset>, like the Moyo plan pages
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read()
+
+
+def normalized(text):
+    return WHITESPACE.sub(" ", text).strip()
+
+
+class KoreanPageTest(unittest.TestCase):
+    def setUp(self):
+        self.page = load("moyo_plan_18452.html")
+
+    def test_backends_match_on_raw_bytes(self):
+        old = bs4_text(self.page)
+        new = lxml_text(self.page)
+        self.assertIn("슈가모바일 | ITEMMANIA 5G 통화무제한 150GB++", new)
+        self.assertEqual(normalized(old), normalized(new))
+
+    def test_backends_match_on_text(self):
+        page = self.page.decode("utf-8")
+        self.assertEqual(normalized(bs4_text(page)), normalized(lxml_text(page)))
+
+    def test_plan_row_matches_bs4(self):
+        old = regex_extract(bs4_text(self.page, strip=(), normalize=False))
+        new = parse_plan_html(self.page)["row"]
+        self.assertEqual(old, new)
+        self.assertEqual(new[:3], ["sugarmobile", "ITEMMANIA 5G 통화무제한 150GB++", "49,000원"])
+
+    def test_other_alerts_are_not_expired(self):
+        # The fixture has a tracking script that calls alert() too
+        self.assertFalse(parse_plan_html(self.page)["expired"])
+
+    def test_ended_plan_is_expired(self):
+        script = '<script>alert("판매가 종료 되었습니다.");</script></head>'.encode("utf-8")
+        self.assertTrue(parse_plan_html(self.page.replace(b"</head>", script, 1))["expired"])
+
+    def test_complete_only_with_every_expand_section(self):
+        row = parse_plan_html(self.page)["row"]
+        self.assertTrue(is_complete(row))
+        row[EXPAND_ONLY_FIELDS[-1]] = NOT_PROVIDED
+        self.assertFalse(is_complete(row))
+
+    def test_xml_declaration(self):
+        page = '<?xml version="1.0" encoding="utf-8"?>' + self.page.decode("utf-8")
+        self.assertEqual(normalized(bs4_text(self.page)), normalized(lxml_text(page)))
+
+    def test_response_without_charset_is_utf8(self):
+        response = Response()
+        response._content = self.page
+        response.headers["Content-Type"] = "text/html"
+        self.assertIn("모요, 모두의요금제", response_text(response))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import openai
+
+CHUNK_INDEX = re.compile(r"(\d+)(?!.*\d)")
+DEFAULT_BACKEND = os.environ.get("TRANSCRIPTION_BACKEND", "openai")
+
+
+class OpenAIWhisperBackend:
+    """The Whisper API. Uploads are independent, so several chunks can be in flight at once."""
+
+    max_workers = 6
+
+    def __init__(self, client=None, model="whisper-1"):
+        self.client = client or openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = model
+
+    def transcribe(self, path):
+        with open(path, "rb") as audio_file:
+            return self.client.audio.transcriptions.create(model=self.model, file=audio_file).text
+
+
+class FasterWhisperBackend:
+    """
+    A local faster-whisper model, for offline use (`pip install faster-whisper`).
+    The model is loaded on first use and shared; it already uses every core for
+    one chunk, so chunks run one at a time.
+    """
+
+    max_workers = 1
+
+    def __init__(self, model_size=None, device="auto", compute_type="int8"):
+        self.model_size = model_size or os.environ.get("WHISPER_MODEL", "base")
+        self.device = device
+        self.compute_type = compute_type
+        self.model = None
+        self.lock = threading.Lock()
+
+    def transcribe(self, path):
+        with self.lock:
+            if self.model is None:
+                from faster_whisper import WhisperModel
+
+                self.model = WhisperModel(self.model_size, device=self.device, compute_type=self.compute_type)
+        segments, _ = self.model.transcribe(path)
+        return "".join(segment.text for segment in segments)
+
+
+BACKENDS = {
+    "openai": OpenAIWhisperBackend,
+    "faster-whisper": FasterWhisperBackend,
+}
+
+
+def get_backend(name=DEFAULT_BACKEND, **kwargs):
+    return BACKENDS[name](**kwargs)
+
+
+def chunk_index(path):
+    """Number of a chunk_<n> file; a plain sort would put chunk_10 before chunk_2."""
+    match = CHUNK_INDEX.search(os.path.splitext(os.path.basename(path))[0])
+    return int(match.group(1)) if match else -1
+
+
+def transcribe_with_retries(backend, path, attempts=3, base_delay=2.0, max_delay=30.0):
+    for attempt in range(attempts):
+        try:
+            return backend.transcribe(path)
+        except Exception:
+            if attempt == attempts - 1:
+                raise
+            # Full jitter, so chunks that failed together do not retry together
+            time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+def transcribe_files(files, backend, max_workers=None, attempts=3, on_progress=None):
+    """
+    Transcribe audio chunks concurrently, at most `max_workers` at a time (the
+    backend's own limit by default), and return their texts in chunk order. A chunk
+    that still fails after `attempts` tries leaves an empty text.
+    `on_progress(done, total, path, error)` is called from the calling thread after
+    each chunk, so it may use Streamlit.
+    """
+    files = sorted(files, key=chunk_index)
+    texts = [""] * len(files)
+    workers = max(1, min(max_workers or backend.max_workers, len(files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="transcribe") as executor:
+        futures = {
+            executor.submit(transcribe_with_retries, backend, path, attempts): index
+            for index, path in enumerate(files)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            error = future.exception()
+            if error is None:
+                texts[index] = future.result()
+            if on_progress:
+                on_progress(done, len(files), files[index], error)
+    return texts
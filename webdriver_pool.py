@@ -0,0 +1,148 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+from selenium import webdriver
+from selenium.common.exceptions import (
+    InvalidSessionIdException,
+    NoSuchWindowException,
+    SessionNotCreatedException,
+    WebDriverException,
+)
+from selenium.webdriver import ChromeOptions
+from selenium.webdriver.chrome import service as fs
+from webdriver_manager.chrome import ChromeDriverManager
+from webdriver_manager.core.os_manager import ChromeType
+
+_chromedriver_path = None
+_chromedriver_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+# The browser itself is gone; anything else (timeouts, missing elements) is about the page
+SESSION_ERRORS = (InvalidSessionIdException, NoSuchWindowException, SessionNotCreatedException)
+
+
+def chromedriver_path():
+    """Resolve the chromedriver binary once per process instead of once per browser."""
+    global _chromedriver_path
+    with _chromedriver_lock:
+        if _chromedriver_path is None:
+            _chromedriver_path = ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
+        return _chromedriver_path
+
+
+def setup_driver():
+    options = ChromeOptions()
+    # option設定を追加（設定する理由はメモリの削減）
+    options.add_argument("--headless")
+    options.add_argument('--disable-gpu')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    options.add_argument('--disable-extensions')
+    prefs = {"profile.managed_default_content_settings.images": 2}
+    options.add_experimental_option("prefs", prefs)
+
+    service = fs.Service(chromedriver_path())
+    driver = webdriver.Chrome(
+                            options=options,
+                            service=service
+                            )
+    return driver
+
+
+class WebDriverPool:
+    """
+    A bounded set of headless Chromium instances reused across pages.
+    A browser is health-checked before it is handed out and replaced after
+    `max_pages` pages, or when it fails with a session error or stops answering.
+    Page errors such as wait timeouts keep the browser in the pool.
+    """
+
+    def __init__(self, size=3, max_pages=50):
+        self.size = size
+        self.max_pages = max_pages
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.pages = {}
+        self.lock = threading.Lock()
+
+    def _healthy(self, driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except WebDriverException:
+            return False
+
+    def _quit(self, driver):
+        with self.lock:
+            self.pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def acquire(self, timeout=None):
+        if not self.slots.acquire(timeout=timeout):
+            raise TimeoutError("No browser became available in the WebDriver pool")
+        try:
+            while True:
+                try:
+                    driver = self.idle.get_nowait()
+                except queue.Empty:
+                    break
+                if self._healthy(driver):
+                    return driver
+                self._quit(driver)
+            driver = setup_driver()
+            with self.lock:
+                self.pages[id(driver)] = 0
+            return driver
+        except Exception:
+            self.slots.release()
+            raise
+
+    def release(self, driver, broken=False):
+        try:
+            with self.lock:
+                self.pages[id(driver)] = self.pages.get(id(driver), 0) + 1
+                worn_out = self.pages[id(driver)] >= self.max_pages
+            if broken or worn_out:
+                self._quit(driver)
+                return
+            try:
+                driver.delete_all_cookies()
+                self.idle.put(driver)
+            except WebDriverException:
+                self._quit(driver)
+        finally:
+            self.slots.release()
+
+    @contextmanager
+    def driver(self, timeout=None):
+        driver = self.acquire(timeout)
+        broken = False
+        try:
+            yield driver
+        except Exception as e:
+            # A connection error to chromedriver is not a WebDriverException, the health check catches it
+            broken = isinstance(e, SESSION_ERRORS) or not self._healthy(driver)
+            raise
+        finally:
+            self.release(driver, broken)
+
+    def close(self):
+        while True:
+            try:
+                self._quit(self.idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+def get_webdriver_pool(size=3, max_pages=50):
+    """Process-wide pool, shared by every Streamlit session."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WebDriverPool(size, max_pages)
+        return _pool
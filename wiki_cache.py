@@ -0,0 +1,195 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from langchain.schema import Document
+
+CACHE_PATH = "./.cache/wikipedia/articles.sqlite"
+# Any MediaWiki action API: Wikipedia itself, or a local mirror for offline use.
+# Empty means offline, answering only from the cache and the imported dumps.
+API_URL = os.environ.get("WIKI_API_URL", "https://en.wikipedia.org/w/api.php")
+TTL = float(os.environ.get("WIKI_CACHE_TTL", 7 * 24 * 3600))
+# Same limits as WikipediaRetriever
+MAX_QUERY_LENGTH = 300
+DOC_CONTENT_CHARS_MAX = 4000
+USER_AGENT = "fullstack-gpt QuizAI (https://github.com/M8chaa/fullstack-gpt)"
+
+
+class WikiCache:
+    """
+    Wikipedia articles kept in SQLite with a full-text index. Searches and articles
+    expire after `ttl` seconds; imported dump articles never do. The top-k articles
+    of a search are fetched concurrently, and only when they are not cached yet, so
+    repeated and related topics resolve from disk. Without an API (or when it is
+    unreachable) searches run against the full-text index instead.
+    """
+
+    def __init__(self, path=CACHE_PATH, api_url=API_URL, ttl=TTL, max_workers=8, timeout=10):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.api_url = api_url
+        self.ttl = ttl
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.local = threading.local()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS articles ("
+                "title TEXT PRIMARY KEY, url TEXT, summary TEXT, content TEXT, fetched REAL, pinned INTEGER DEFAULT 0)"
+            )
+            self.conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(title, content)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS searches (query TEXT PRIMARY KEY, titles TEXT, fetched REAL)")
+
+    def session(self):
+        # requests.Session is not thread safe, every fetch thread keeps its own
+        if not hasattr(self.local, "session"):
+            self.local.session = requests.Session()
+            self.local.session.headers["User-Agent"] = USER_AGENT
+        return self.local.session
+
+    def api(self, **params):
+        response = self.session().get(
+            self.api_url,
+            params={"action": "query", "format": "json", "formatversion": 2, **params},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["query"]
+
+    def fresh(self, fetched, pinned=False):
+        return pinned or time.time() - fetched < self.ttl
+
+    def search(self, query, top_k=5):
+        """Documents of the top-k articles for `query`, shaped like the ones WikipediaRetriever returns."""
+        query = query.strip()[:MAX_QUERY_LENGTH]
+        titles = self.search_titles(query, top_k)
+        articles = self.cached_articles(titles)
+        missing = [title for title in titles if title not in articles or not self.fresh(*articles[title][3:])]
+        if missing and self.api_url:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(missing))) as executor:
+                for title, article in zip(missing, executor.map(self.fetch_article, missing)):
+                    # A failed refresh falls back to the stale copy, if there is one
+                    if article:
+                        articles[title] = article
+        return [
+            Document(
+                page_content=articles[title][2][:DOC_CONTENT_CHARS_MAX],
+                metadata={"title": title, "summary": articles[title][1], "source": articles[title][0]},
+            )
+            for title in titles
+            if title in articles
+        ]
+
+    def search_titles(self, query, top_k):
+        key = f"{top_k}:{query.lower()}"
+        with self.lock:
+            row = self.conn.execute("SELECT titles, fetched FROM searches WHERE query = ?", (key,)).fetchone()
+        if row and self.fresh(row[1]):
+            return json.loads(row[0])
+        if self.api_url:
+            try:
+                results = self.api(list="search", srsearch=query, srlimit=top_k, srprop="")["search"]
+            except (requests.RequestException, KeyError, ValueError):
+                results = None
+            if results is not None:
+                titles = [result["title"] for result in results]
+                with self.lock, self.conn:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO searches (query, titles, fetched) VALUES (?, ?, ?)",
+                        (key, json.dumps(titles, ensure_ascii=False), time.time()),
+                    )
+                return titles
+        if row:
+            return json.loads(row[0])
+        return self.local_titles(query, top_k)
+
+    def local_titles(self, query, top_k):
+        """Best matches of the full-text index, for offline use."""
+        terms = " OR ".join(f'"{term}"' for term in query.replace('"', " ").split())
+        if not terms:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT title FROM articles_fts WHERE articles_fts MATCH ? ORDER BY bm25(articles_fts, 10.0, 1.0) LIMIT ?",
+                (terms, top_k),
+            ).fetchall()
+        return [title for title, in rows]
+
+    def cached_articles(self, titles):
+        """title -> (url, summary, content, fetched, pinned) of the cached ones."""
+        if not titles:
+            return {}
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT title, url, summary, content, fetched, pinned FROM articles "
+                f"WHERE title IN ({', '.join('?' for _ in titles)})",
+                titles,
+            ).fetchall()
+        return {row[0]: row[1:] for row in rows}
+
+    def fetch_article(self, title):
+        """Plain text of one article from the API, stored on the way; None for missing and disambiguation pages."""
+        try:
+            pages = self.api(
+                prop="extracts|info|pageprops",
+                explaintext=1,
+                inprop="url",
+                ppprop="disambiguation",
+                redirects=1,
+                titles=title,
+            )["pages"]
+        except (requests.RequestException, KeyError, ValueError):
+            return None
+        page = pages[0] if pages else {}
+        if page.get("missing") or "disambiguation" in page.get("pageprops", {}) or not page.get("extract"):
+            return None
+        content = page["extract"]
+        summary = content.split("\n==")[0].strip()
+        url = page.get("fullurl", "")
+        self.put(title, url, summary, content)
+        return url, summary, content, time.time(), False
+
+    def put(self, title, url, summary, content, pinned=False):
+        with self.lock, self.conn:
+            self._insert(title, url, summary, content, pinned)
+
+    def _insert(self, title, url, summary, content, pinned):
+        self.conn.execute("DELETE FROM articles_fts WHERE title = ?", (title,))
+        self.conn.execute(
+            "INSERT OR REPLACE INTO articles (title, url, summary, content, fetched, pinned) VALUES (?, ?, ?, ?, ?, ?)",
+            (title, url, summary, content, time.time(), int(pinned)),
+        )
+        self.conn.execute("INSERT INTO articles_fts (title, content) VALUES (?, ?)", (title, content))
+
+    def import_dump(self, path):
+        """
+        Load a JSON lines dump (one {"title", "text", "url"} object per line, e.g.
+        the output of `wikiextractor --json`). Imported articles never expire.
+        """
+        count = 0
+        # One transaction for the whole file, a commit per article would dominate the import
+        with open(path, encoding="utf-8") as f, self.lock, self.conn:
+            for line in f:
+                article = json.loads(line)
+                if not article.get("text"):
+                    continue
+                content = article["text"]
+                summary = content.split("\n\n")[0].strip()
+                self._insert(article["title"], article.get("url", ""), summary, content, True)
+                count += 1
+        return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import Wikipedia dumps into the local article cache.")
+    parser.add_argument("dumps", nargs="+", help="JSON lines files with title, text and url")
+    args = parser.parse_args()
+    cache = WikiCache()
+    for dump in args.dumps:
+        print(f"{dump}: {cache.import_dump(dump)} articles")